@@ -1,2 +1,37 @@
+import importlib
+import importlib.util
+
+from nonogen import nono
 from nonogen.nono import *
-from nonogen.nonogen import *
+
+# Names from nonogen.nonogen that __getattr__ imports it for, also exported by import *.
+_GENERATOR_NAMES = ("GENERATORS", "GenStats", "NOISE_FIELDS", "NoiseFieldCache", "from_image",
+                    "gen_cellular", "gen_image", "gen_perlin", "gen_perlin_cached", "gen_random",
+                    "gen_symmetric", "gen_unique", "generator", "generator_name", "is_trivial",
+                    "regenerate")
+
+__all__ = nono.__all__ + list(_GENERATOR_NAMES)
+
+
+def __getattr__(name):
+    """Get submodules and names from nonogen.nonogen on first use.
+
+    Generators need NumPy, which takes longer to import than the rest of the package, so it's
+    only imported once something asks for them. Whatever's found is kept in the module, so this
+    only runs once per name.
+    """
+    if not name.startswith("_"):
+        if importlib.util.find_spec(f"{__name__}.{name}") is not None:
+            value = importlib.import_module(f"{__name__}.{name}")
+        else:
+            value = getattr(importlib.import_module(f"{__name__}.nonogen"), name, None)
+
+        if value is not None:
+            globals()[name] = value
+            return value
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
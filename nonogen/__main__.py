@@ -1,17 +1,147 @@
 #!/usr/bin/env python3
 
-import nono
-import nonogen
+import argparse
 import random
+import sys
+import time
+
+import nonogen
+
+# Subcommands import what they need themselves, so that quick ones like show don't pay for
+# NumPy, PIL or the process pool.
+
+GENERATOR_HELP = "generator name from nonogen.GENERATORS, in any case"
+
+
+def _generator_name(parser, name):
+    """Find a generator's name in GENERATORS, ignoring case, or exit with a usage error."""
+    try:
+        return nonogen.generator_name(name)
+    except ValueError as e:
+        parser.error(str(e))
 
-if __name__ == "__main__":
-    grid = nono.NonoGrid(random.choice(range(5, 20)), random.choice(range(5,20)))
 
-    nonogen.gen_perlin(grid)
+def single(args=None):
+    height = getattr(args, "height", None) or random.choice(range(5, 20))
+    width = getattr(args, "width", None) or random.choice(range(5,20))
+    grid = nonogen.NonoGrid(height, width)
 
+    kwargs = {}
+    if getattr(args, "gen", None) is not None:
+        kwargs["gen"] = nonogen.GENERATORS[args.gen]
+    if getattr(args, "seed", None) is not None:
+        kwargs["rng"] = random.Random(args.seed)
+
+    stats = nonogen.GenStats()
+    result = nonogen.gen_unique(grid, stats=stats, **kwargs)
+    if result is None:
+        print(f"No unique puzzle found.\n{stats}")
+    else:
+        print(f"{grid.type} ({result.difficulty.band}, {result.difficulty.score:.2f})\n{grid}\n"
+              f"{stats}")
+
+        if getattr(args, "pictures", True):
+            grid.to_pictures("nonogrid.jpg", "nonogrid_solved.jpg")
+
+
+def show(args):
+    grid = nonogen.decode(args.puzzle)
     grid.gen_hints()
+    grid.write_text(sys.stdout)
+
+    if args.picture is not None:
+        grid.to_picture(args.picture)
+
+
+def run_batch(args):
+    from nonogen import batch
 
-    print(f"{grid.type} \n{grid}")
+    difficulty = None
+    if args.min_difficulty is not None or args.max_difficulty is not None:
+        difficulty = (args.min_difficulty, args.max_difficulty)
 
-    grid.to_picture("nonogrid.jpg")
-    grid.to_picture("nonogrid_solved.jpg", has_value_color="orange")
+    start = time.perf_counter()
+    written, failed = batch.write_batch(args.out, args.count, args.height, args.width or args.height,
+                                        gen_name=args.gen, seed=args.seed,
+                                        workers=args.workers, max_attempts=args.max_attempts,
+                                        difficulty=difficulty, dedup=args.dedup)
+
+    elapsed = time.perf_counter() - start
+    print(f"Wrote {written} puzzles to {args.out} in {elapsed:.2f}s ({failed} failed).")
+
+
+def run_serve(args):
+    import asyncio
+    from nonogen import serve
+
+    try:
+        asyncio.run(serve.serve(args.host or serve.DEFAULT_HOST, args.port,
+                                height=args.height, width=args.width, gen_name=args.gen,
+                                pool_size=args.pool, workers=args.workers, seed=args.seed))
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="nonogen", description="Generate nonograms.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    gen_parser = subparsers.add_parser(
+        "gen", help="generate one puzzle, print it and draw it (the default)")
+    gen_parser.add_argument("--height", type=int, help="defaults to a random size")
+    gen_parser.add_argument("--width", type=int, help="defaults to a random size")
+    gen_parser.add_argument("--gen", default="Perlin", help=GENERATOR_HELP)
+    gen_parser.add_argument("--seed", type=int)
+    gen_parser.add_argument("--no-pictures", dest="pictures", action="store_false",
+                            help="don't write nonogrid.jpg and nonogrid_solved.jpg")
+
+    show_parser = subparsers.add_parser("show", help="print an encoded puzzle")
+    show_parser.add_argument("puzzle", help="puzzle as given by NonoGrid.encode()")
+    show_parser.add_argument("--picture", help="also draw it to this file")
+
+    batch_parser = subparsers.add_parser("batch", help="generate many puzzles in parallel")
+    batch_parser.add_argument("count", type=int, help="number of puzzles to generate")
+    batch_parser.add_argument("--out", default="puzzles.jsonl",
+                              help="JSONL file to append to, or a directory for text and pictures")
+    batch_parser.add_argument("--height", type=int, default=15)
+    batch_parser.add_argument("--width", type=int, help="defaults to height")
+    batch_parser.add_argument("--gen", default="Perlin", help=GENERATOR_HELP)
+    batch_parser.add_argument("--seed", type=int, default=0,
+                              help="batch seed; the same seed gives the same puzzles")
+    batch_parser.add_argument("--workers", type=int, help="defaults to the number of CPUs")
+    batch_parser.add_argument("--max-attempts", type=int, default=100,
+                              help="attempts at a unique puzzle before giving up on one")
+    batch_parser.add_argument("--min-difficulty", type=float,
+                              help="reject puzzles with a lower difficulty score")
+    batch_parser.add_argument("--max-difficulty", type=float,
+                              help="reject puzzles with a higher difficulty score")
+    batch_parser.add_argument("--dedup", metavar="INDEX",
+                              help="SQLite index of puzzles already made, to skip and update")
+
+    serve_parser = subparsers.add_parser("serve", help="serve puzzles over HTTP from a warm pool")
+    serve_parser.add_argument("--host", help="defaults to 127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument("--height", type=int, default=15)
+    serve_parser.add_argument("--width", type=int, help="defaults to height")
+    serve_parser.add_argument("--gen", default="Perlin", help=GENERATOR_HELP)
+    serve_parser.add_argument("--pool", type=int, default=16, help="puzzles to keep ready")
+    serve_parser.add_argument("--workers", type=int, help="defaults to the number of CPUs")
+    serve_parser.add_argument("--seed", type=int,
+                              help="server seed; the same seed gives the same puzzles in order")
+
+    args = parser.parse_args(argv)
+    if getattr(args, "gen", None) is not None:
+        args.gen = _generator_name(parser, args.gen)
+
+    if args.command == "batch":
+        run_batch(args)
+    elif args.command == "serve":
+        run_serve(args)
+    elif args.command == "show":
+        show(args)
+    else:
+        single(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Bulk archives of encoded puzzles, with random access.
+
+An archive file is a header, then every puzzle's NonoGrid.encode_bytes() form back to back, then
+an index of where each one starts. The header holds a magic string, the archive format version,
+the puzzle count and where the index is. The index has one more offset than there are puzzles,
+so puzzle k runs from offset k to offset k+1. Numbers are little-endian.
+
+Reading memory-maps the file, so fetching any one puzzle only touches that puzzle's bytes and its
+two index entries.
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from nonogen.nono import decode_bytes
+
+MAGIC = b"NONOARC"
+ARCHIVE_VERSION = 1
+HEADER = struct.Struct("<7sBQQ")
+OFFSET = struct.Struct("<Q")
+
+
+class ArchiveWriter:
+    """Write puzzles to a new archive file, one at a time."""
+    def __init__(self, filename):
+        self.file = open(filename, "wb")
+        self.file.write(HEADER.pack(MAGIC, ARCHIVE_VERSION, 0, 0))
+        self.offsets = array("Q", [HEADER.size])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def add(self, grid):
+        """Add a NonoGrid to the archive."""
+        self.add_bytes(grid.encode_bytes())
+
+    def add_bytes(self, data):
+        """Add an already-encoded puzzle, in NonoGrid.encode_bytes() form, to the archive."""
+        self.file.write(data)
+        self.offsets.append(self.offsets[-1] + len(data))
+
+    def close(self):
+        """Write the index and header, and close the file."""
+        if self.file.closed:
+            return
+
+        index_offset = self.offsets[-1]
+        offsets = self.offsets
+        if sys.byteorder != "little":
+            offsets = array("Q", offsets)
+            offsets.byteswap()
+
+        self.file.write(offsets.tobytes())
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, ARCHIVE_VERSION, len(self), index_offset))
+        self.file.close()
+
+
+class Archive:
+    """Read-only, random-access view of an archive file."""
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            # mmap can't map an empty file, and a shorter one has no header to read.
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise ValueError(f"{filename} is not a puzzle archive")
+
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.count, self.index_offset = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC:
+            self.mmap.close()
+            raise ValueError(f"{filename} is not a puzzle archive")
+
+        if version != ARCHIVE_VERSION:
+            self.mmap.close()
+            raise ValueError(f"Unknown archive version {version}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, k):
+        """Decode puzzle k."""
+        return decode_bytes(self.get_bytes(k))
+
+    def __iter__(self):
+        """Decode puzzles one at a time, in order."""
+        for k in range(self.count):
+            yield self[k]
+
+    def get_bytes(self, k):
+        """Get puzzle k's encoded bytes, as a memoryview into the archive without copying.
+
+        Release the view before closing the archive.
+        """
+        if k < 0:
+            k += self.count
+        if not 0 <= k < self.count:
+            raise IndexError("puzzle index out of range")
+
+        start, = OFFSET.unpack_from(self.mmap, self.index_offset + k * OFFSET.size)
+        end, = OFFSET.unpack_from(self.mmap, self.index_offset + (k + 1) * OFFSET.size)
+        return memoryview(self.mmap)[start:end]
+
+    def close(self):
+        self.mmap.close()
+
+
+def write_archive(filename, grids):
+    """Write an archive of the given NonoGrids, returning how many were written."""
+    with ArchiveWriter(filename) as writer:
+        for grid in grids:
+            writer.add(grid)
+
+        return len(writer)
@@ -0,0 +1,138 @@
+"""Generate many puzzles at once across worker processes."""
+import base64
+import json
+import os
+import random
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from os import path
+
+from nonogen import nonogen
+from nonogen.dedup import HintIndex
+from nonogen.nono import hints_hash, pack_hints
+from nonogen.pool import GRIDS
+
+
+def _gen_one(index, seed, height, width, gen_name, max_attempts, picture_dir, difficulty,
+             gen_kwargs):
+    """Generate puzzle number index of a batch, in a worker process.
+
+    The RNG is seeded from the batch seed and the index, so each puzzle comes out the same no
+    matter which worker makes it or in what order.
+    """
+    rng = random.Random(f"{seed}:{index}")
+
+    # Each worker process reuses its grids from one puzzle to the next.
+    with GRIDS.grid(height, width) as grid:
+        result = nonogen.gen_unique(grid, gen=nonogen.GENERATORS[gen_name],
+                                    max_attempts=max_attempts, difficulty=difficulty, rng=rng,
+                                    **gen_kwargs)
+        if result is None:
+            return {"index": index, "seed": seed, "puzzle": None}
+
+        if picture_dir is not None:
+            grid.to_pictures(*_picture_names(picture_dir, index))
+
+        hints = pack_hints(grid.left_hints, grid.top_hints)
+        return {"index": index, "seed": seed, "height": height, "width": width,
+                "type": grid.type, "puzzle_seed": grid.seed, "gen_kwargs": grid.gen_kwargs,
+                "difficulty": round(result.difficulty.score, 3), "band": result.difficulty.band,
+                "puzzle": grid.encode(), "hints": base64.urlsafe_b64encode(hints).decode(),
+                "hints_hash": hints_hash(grid.left_hints, grid.top_hints).hex()}
+
+
+def _picture_names(picture_dir, index):
+    """Unsolved and solved picture filenames for puzzle number index."""
+    return (path.join(picture_dir, f"nonogrid_{index}.jpg"),
+            path.join(picture_dir, f"nonogrid_{index}_solved.jpg"))
+
+
+def gen_batch(count, height, width, gen_name="Perlin", seed=0, workers=None, max_attempts=100,
+              picture_dir=None, difficulty=None, dedup=None, gen_kwargs=None):
+    """Generate count unique puzzles across a pool of worker processes.
+
+    Yields a dict for each puzzle as soon as it's done, so not in index order. Puzzles that
+    couldn't be made unique (and within the difficulty band, if given as (min, max) scores) in
+    max_attempts tries have a puzzle of None. gen_name is a name from GENERATORS, in any case,
+    and gen_kwargs are keyword arguments for it. Each puzzle records its type, puzzle_seed and
+    gen_kwargs, which is enough for regenerate to make it again.
+
+    If dedup is given, it's the filename of a HintIndex of puzzles already made. Puzzles with
+    hints in it are skipped and replaced by puzzles at further indices, up to count replacements
+    in all, and new puzzles are added to it.
+    """
+    gen_name = nonogen.generator_name(gen_name)
+    gen_kwargs = gen_kwargs or {}
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    seen = HintIndex(dedup) if dedup is not None else None
+    target = count
+
+    # Keep a bounded number of puzzles in flight, so huge batches don't queue up every task at
+    # once.
+    in_flight = workers * 4
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        next_index = 0
+        try:
+            while pending or next_index < target:
+                while next_index < target and len(pending) < in_flight:
+                    pending.add(executor.submit(_gen_one, next_index, seed, height, width,
+                                                gen_name, max_attempts, picture_dir, difficulty,
+                                                gen_kwargs))
+                    next_index += 1
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    puzzle = future.result()
+                    if (seen is not None and puzzle["puzzle"] is not None
+                            and not seen.add(bytes.fromhex(puzzle["hints_hash"]))):
+                        if picture_dir is not None:
+                            for filename in _picture_names(picture_dir, puzzle["index"]):
+                                os.remove(filename)
+
+                        target = min(target + 1, count * 2)
+                        continue
+
+                    yield puzzle
+        finally:
+            if seen is not None:
+                seen.close()
+
+
+def write_batch(out, count, height, width, **kwargs):
+    """Generate a batch of puzzles into out, streaming results as they finish.
+
+    If out ends in .jsonl, each puzzle is a line of JSON there. Otherwise out is a directory, and
+    each puzzle gets its encoded string in a text file plus unsolved and solved pictures.
+    Returns (written, failed) counts.
+    """
+    jsonl = out.endswith(".jsonl")
+    if not jsonl:
+        os.makedirs(out, exist_ok=True)
+        kwargs["picture_dir"] = out
+
+    written = 0
+    failed = 0
+    jsonl_file = open(out, "a", encoding="utf-8") if jsonl else None
+    try:
+        for puzzle in gen_batch(count, height, width, **kwargs):
+            if puzzle["puzzle"] is None:
+                failed += 1
+                continue
+
+            if jsonl:
+                jsonl_file.write(json.dumps(puzzle) + "\n")
+                jsonl_file.flush()
+            else:
+                filename = path.join(out, f"nonogrid_{puzzle['index']}.txt")
+                with open(filename, "w", encoding="utf-8") as f:
+                    f.write(puzzle["puzzle"] + "\n")
+
+            written += 1
+    finally:
+        if jsonl_file is not None:
+            jsonl_file.close()
+
+    return written, failed
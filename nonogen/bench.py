@@ -0,0 +1,169 @@
+"""Benchmarks for generation, hints, encoding and rendering.
+
+Run with `python -m nonogen.bench`. Save a baseline with --save, and later runs given --baseline
+fail if any stage got slower than the threshold allows.
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from os import path
+
+from nonogen.nono import NonoGrid, decode
+from nonogen.nonogen import gen_cellular, gen_perlin, gen_random
+
+SIZES = (5, 10, 25, 50, 100, 200)
+
+# Rendered pictures grow with the square of the grid size, at 55 pixels a square, so past this
+# they take more memory than is sensible for a benchmark.
+MAX_PICTURE_SIZE = 50
+
+
+def _setup(size):
+    """Make a grid with squares and hints, and its encoded form."""
+    grid = NonoGrid(size)
+    gen_random(grid)
+    grid.gen_hints()
+    return grid, grid.encode()
+
+
+def _to_picture(grid, encoded, tmpdir):
+    grid.to_picture(path.join(tmpdir, "bench.jpg"))
+
+
+def _str(grid, encoded, tmpdir):
+    # Forget the display hints, so each run pays for them like a newly made grid's first print.
+    grid._display = None
+    str(grid)
+
+
+# Stage name to function of (grid, encoded, tmpdir), and the biggest size to run it at.
+STAGES = {
+    "gen_perlin": (lambda grid, encoded, tmpdir: gen_perlin(grid), None),
+    "gen_random": (lambda grid, encoded, tmpdir: gen_random(grid), None),
+    "gen_cellular": (lambda grid, encoded, tmpdir: gen_cellular(grid), None),
+    "gen_hints": (lambda grid, encoded, tmpdir: grid.gen_hints(), None),
+    "encode": (lambda grid, encoded, tmpdir: grid.encode(), None),
+    "decode": (lambda grid, encoded, tmpdir: decode(encoded), None),
+    "display_hints": (lambda grid, encoded, tmpdir: grid.set_hints_for_display(), None),
+    "str": (_str, None),
+    "to_picture": (_to_picture, MAX_PICTURE_SIZE),
+    "to_bitmap": (lambda grid, encoded, tmpdir: grid.to_bitmap(), None),
+}
+
+
+def bench_stage(func, size, repeat, tmpdir):
+    """Time one stage at one size.
+
+    Returns the best time of repeat runs, and peak memory from a separate traced run, since
+    tracing slows everything down. An untimed run first warms up imports and caches.
+    """
+    grid, encoded = _setup(size)
+    func(grid, encoded, tmpdir)
+
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(grid, encoded, tmpdir)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(grid, encoded, tmpdir)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"seconds": best, "cells_per_second": size * size / best if best else float("inf"),
+            "peak_bytes": peak}
+
+
+def run(stages=None, sizes=SIZES, repeat=5, seed=0):
+    """Run benchmarks, returning results keyed by stage and then size (as a string, for JSON)."""
+    random.seed(seed)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for stage in stages or STAGES:
+            func, max_size = STAGES[stage]
+            results[stage] = {}
+            for size in sizes:
+                if max_size is not None and size > max_size:
+                    continue
+
+                results[stage][str(size)] = bench_stage(func, size, repeat, tmpdir)
+
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Find stages that got slower than baseline by more than threshold, as a fraction.
+
+    Returns a list of (stage, size, seconds, baseline seconds).
+    """
+    regressions = []
+    for stage, sizes in results.items():
+        for size, result in sizes.items():
+            base = baseline.get(stage, {}).get(size)
+            if base is not None and result["seconds"] > base["seconds"] * (1 + threshold):
+                regressions.append((stage, size, result["seconds"], base["seconds"]))
+
+    return regressions
+
+
+def report(results, baseline=None):
+    """Format results as a table, with change from baseline if there is one."""
+    lines = [f"{'stage':<14}{'size':>6}{'ms':>12}{'cells/s':>14}{'peak KiB':>12}{'change':>10}"]
+    for stage, sizes in results.items():
+        for size, result in sizes.items():
+            change = ""
+            base = (baseline or {}).get(stage, {}).get(size)
+            if base is not None:
+                change = f"{result['seconds'] / base['seconds'] - 1:+.1%}"
+
+            lines.append(f"{stage:<14}{size:>6}{result['seconds'] * 1000:>12.3f}"
+                         f"{result['cells_per_second']:>14.0f}"
+                         f"{result['peak_bytes'] / 1024:>12.1f}{change:>10}")
+
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="nonogen.bench", description=__doc__.splitlines()[0])
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), help="defaults to all")
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=5, help="runs per stage, best one counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown from baseline, as a fraction")
+    parser.add_argument("--save", help="write results as JSON here, for use as a baseline")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = run(args.stages, args.sizes, args.repeat, args.seed)
+    print(report(results, baseline))
+
+    if args.save is not None:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for stage, size, seconds, base in regressions:
+            print(f"REGRESSION: {stage} at {size}x{size} took {seconds * 1000:.3f}ms, "
+                  f"baseline {base * 1000:.3f}ms", file=sys.stderr)
+
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
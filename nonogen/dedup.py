@@ -0,0 +1,59 @@
+"""On-disk index of puzzles already made, by the hash of their hints.
+
+Different generations can come out with the same hints, which play as the same puzzle. The index
+keeps every hints_hash() seen in a SQLite table keyed on the hash, so checking and adding one is
+a single indexed lookup however many puzzles there are, and the index persists between batches.
+"""
+import sqlite3
+
+from nonogen.nono import hints_hash
+
+
+class HintIndex:
+    """Set of puzzle hint hashes, stored in a SQLite file.
+
+    Adds are committed every commit_every adds and on close, rather than one at a time.
+    """
+    def __init__(self, filename, commit_every=1000):
+        self.db = sqlite3.connect(filename)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS seen (hash BLOB PRIMARY KEY) WITHOUT ROWID")
+        self.db.commit()
+
+        self.commit_every = commit_every
+        self._uncommitted = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def __contains__(self, key):
+        return self.db.execute("SELECT 1 FROM seen WHERE hash = ?", (key,)).fetchone() is not None
+
+    def add(self, key):
+        """Add a hash, returning True if it's new and False if it was already there."""
+        added = self.db.execute("INSERT OR IGNORE INTO seen VALUES (?)", (key,)).rowcount == 1
+        if added:
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                self.commit()
+
+        return added
+
+    def add_grid(self, grid):
+        """Add a NonoGrid by its hints, which gen_hints must have made. See add."""
+        return self.add(hints_hash(grid.left_hints, grid.top_hints))
+
+    def commit(self):
+        self.db.commit()
+        self._uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self.db.close()
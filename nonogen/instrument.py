@@ -0,0 +1,115 @@
+"""Opt-in timing and counters for the expensive parts of generating and rendering puzzles.
+
+Nothing is recorded until enable() is called. While disabled, instrumented functions only pay
+for checking a flag.
+
+Timed stages record calls, wall time and cells handled. Counters record things like Perlin
+samples evaluated. Both are kept in the module's totals, which prometheus_text() dumps, and are
+passed to any sinks added with add_sink().
+"""
+import functools
+import time
+
+enabled = False
+
+# Stage name to [calls, seconds, cells].
+timings = {}
+
+# Counter name to total.
+counters = {}
+
+_sinks = []
+
+
+def enable():
+    """Start recording."""
+    global enabled
+    enabled = True
+
+
+def disable():
+    """Stop recording. Totals so far are kept."""
+    global enabled
+    enabled = False
+
+
+def reset():
+    """Forget all totals."""
+    timings.clear()
+    counters.clear()
+
+
+def add_sink(sink):
+    """Add a callable to get every measurement as it happens.
+
+    It's called as sink(name, value, cells): for timed stages value is seconds and cells is how
+    many grid cells were handled (or None), and for counters value is the increment and cells is
+    None.
+    """
+    _sinks.append(sink)
+
+
+def remove_sink(sink):
+    _sinks.remove(sink)
+
+
+def count(name, value=1):
+    """Add to a counter, if recording. Check `enabled` first in hot paths."""
+    if not enabled:
+        return
+
+    counters[name] = counters.get(name, 0) + value
+    for sink in _sinks:
+        sink(name, value, None)
+
+
+def _cells(args, result):
+    """How many cells a call handled, from its grid argument or the grid it returned."""
+    for obj in (args[0] if args else None, result):
+        if hasattr(obj, "height") and hasattr(obj, "width"):
+            return obj.height * obj.width
+
+    return None
+
+
+def timed(name):
+    """Decorator recording calls, wall time and cells handled for a function as stage name."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            seconds = time.perf_counter() - start
+
+            cells = _cells(args, result)
+            totals = timings.setdefault(name, [0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += cells or 0
+
+            for sink in _sinks:
+                sink(name, seconds, cells)
+
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def prometheus_text(prefix="nonogen"):
+    """Dump totals in the Prometheus text exposition format."""
+    lines = []
+    for metric, index in (("calls", 0), ("seconds", 1), ("cells", 2)):
+        lines.append(f"# TYPE {prefix}_{metric}_total counter")
+        for name, totals in sorted(timings.items()):
+            lines.append(f'{prefix}_{metric}_total{{stage="{name}"}} {totals[index]}')
+
+    for name, total in sorted(counters.items()):
+        lines.append(f"# TYPE {prefix}_{name}_total counter")
+        lines.append(f"{prefix}_{name}_total {total}")
+
+    return "\n".join(lines) + "\n"
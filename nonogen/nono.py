@@ -1,12 +1,258 @@
 import base64
+import hashlib
+import io
 import json
+import math
+import struct
 import zlib
 from datetime import datetime
-from os import path
+from functools import lru_cache
 
-from PIL import Image, ImageDraw, ImageFont
+from nonogen import instrument
 
-HERE = path.abspath(path.dirname(__file__))
+__all__ = ["ENCODING_VERSION", "HEADER", "HINTS_HASH_SIZE", "NonoGrid", "decode", "decode_bytes",
+           "hints_hash", "pack_hints", "pack_rows", "unpack_hints", "unpack_rows"]
+
+# Binary encoding: a header of format version, height and width, then the squares packed
+# row-major, eight to a byte, first square in the high bit.
+ENCODING_VERSION = 1
+HEADER = struct.Struct(">BHH")
+
+# First byte of the original zlib-compressed encoding, which no binary version uses.
+_ZLIB_HEADER = 0x78
+
+
+def _row_group(width):
+    """How many rows of width squares it takes to fill a whole number of bytes.
+
+    Rows are packed and unpacked that many at a time, each group as one int, so no int or string
+    ever covers the whole grid.
+    """
+    return 8 // math.gcd(width, 8)
+
+
+def pack_rows(rows, width):
+    """Pack row bitmasks, first column most significant, into bytes."""
+    if not rows or width == 0:
+        return b""
+
+    group = _row_group(width)
+    out = bytearray()
+    for start in range(0, len(rows), group):
+        packed = 0
+        for row in rows[start:start + group]:
+            packed = packed << width | row
+
+        # Only the last group can end partway through a byte.
+        size = min(group, len(rows) - start) * width
+        pad = -size % 8
+        out += (packed << pad).to_bytes((size + pad) // 8, "big")
+
+    return bytes(out)
+
+
+def unpack_rows(data, height, width):
+    """Unpack bytes (or any buffer) packed by pack_rows back into row bitmasks.
+
+    Raises ValueError if data isn't exactly the right length for height by width squares.
+    """
+    nbytes = (height * width + 7) // 8
+    if len(data) != nbytes:
+        raise ValueError(f"Expected {nbytes} bytes of squares for a {height}x{width} grid, "
+                         f"got {len(data)}")
+
+    if width == 0:
+        return [0] * height
+
+    group = _row_group(width)
+    group_bytes = group * width // 8
+    mask = (1 << width) - 1
+    rows = []
+    for start in range(0, height, group):
+        count = min(group, height - start)
+        size = count * width
+        pad = -size % 8
+        offset = start // group * group_bytes
+        packed = int.from_bytes(data[offset:offset + (size + pad) // 8], "big") >> pad
+        rows.extend(packed >> (width * (count - 1 - k)) & mask for k in range(count))
+
+    return rows
+
+
+# Hint-only form: height and width, then for each row and then each column, how many runs it has
+# and their lengths. Numbers are unsigned LEB128 varints, so almost all take a byte. An empty
+# line has no runs, so every set of hints has exactly one form.
+HINTS_HASH_SIZE = 16
+
+
+def _pack_varint(n, out):
+    """Append n to a bytearray as a varint."""
+    while n >= 0x80:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _unpack_varint(data, pos):
+    """Read a varint from data at pos, returning it and the position after it."""
+    n = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+def pack_hints(left_hints, top_hints):
+    """Pack row and column hints into the hint-only form."""
+    out = bytearray()
+    _pack_varint(len(left_hints), out)
+    _pack_varint(len(top_hints), out)
+    for hints in (left_hints, top_hints):
+        for hint in hints:
+            runs = [run for run in hint if run]
+            _pack_varint(len(runs), out)
+            for run in runs:
+                _pack_varint(run, out)
+
+    return bytes(out)
+
+
+def unpack_hints(data):
+    """Unpack the hint-only form into (left hints, top hints), with (0,) for empty lines."""
+    height, pos = _unpack_varint(data, 0)
+    width, pos = _unpack_varint(data, pos)
+
+    hints = []
+    for _ in range(height + width):
+        count, pos = _unpack_varint(data, pos)
+        runs = []
+        for _ in range(count):
+            run, pos = _unpack_varint(data, pos)
+            runs.append(run)
+        hints.append(tuple(runs) or (0,))
+
+    return hints[:height], hints[height:]
+
+
+def hints_hash(left_hints, top_hints):
+    """Hash of a puzzle's hints, the same for any puzzle that plays the same."""
+    return hashlib.blake2b(pack_hints(left_hints, top_hints),
+                           digest_size=HINTS_HASH_SIZE).digest()
+
+
+# Picture sizes and colors. PIL itself is only imported when drawing, since it's slow to import
+# and most uses never draw.
+SQUARE_SIZE = 50
+HINT_SPACE_SIZE = 30
+SQUARE_DIVIDER_SIZE = 5
+SPACER_SIZE = 10
+FONT_SIZE = 45
+
+EMPTY = (255, 255, 255)
+BG_GREY = (0, 0, 0)
+DIVIDER = BG_GREY
+PREBLOCKED_GREY = (200, 209, 211)
+HINT_COLOR = (255, 255, 255)
+
+
+@lru_cache(maxsize=None)
+def _load_font(font_name):
+    """Load font for hints, once per font."""
+    from PIL import ImageFont
+
+    if font_name is not None:
+        return ImageFont.truetype(font_name, FONT_SIZE)
+
+    return ImageFont.load_default()
+
+
+@lru_cache(maxsize=1024)
+def _glyph(char, font_name):
+    """Pre-render one hint character as a mask to paste, or None if it draws nothing."""
+    from PIL import Image, ImageDraw
+
+    font = _load_font(font_name)
+    left, top, right, bottom = font.getbbox(char)
+    if right <= 0 or bottom <= 0:
+        return None
+
+    mask = Image.new("L", (right, bottom))
+    ImageDraw.Draw(mask).text((0, 0), char, font=font, fill=255)
+    return mask
+
+
+def _ink(im, color):
+    """Color in the form the image takes it: as is, or as a palette index for "P" images."""
+    if im.mode != "P":
+        return color
+
+    if isinstance(color, str):
+        from PIL import ImageColor
+        color = ImageColor.getrgb(color)
+
+    return im.palette.getcolor(color, im)
+
+
+@lru_cache(maxsize=1024)
+def _bilevel_glyph(char, font_name):
+    """Hint character mask without antialiasing, for palette images, which can't blend."""
+    mask = _glyph(char, font_name)
+    if mask is None:
+        return None
+
+    return mask.point(lambda v: 255 if v >= 128 else 0, "1")
+
+
+def _paste_glyph(im, x0, y0, char, font_name, ink):
+    """Paste a hint character at x0, y0 in the given ink."""
+    mask = _bilevel_glyph(char, font_name) if im.mode == "P" else _glyph(char, font_name)
+    if mask is not None:
+        im.paste(ink, (x0, y0), mask)
+
+
+def _paint_boxes(im, boxes, color):
+    """Fill every box in the image with one color."""
+    ink = _ink(im, color)
+    for box in boxes:
+        im.paste(ink, box)
+
+
+def _save(im, filename, format, save_options):
+    """Save a picture to a path or file object, or return it as bytes without a filename."""
+    if filename is not None:
+        if format is None and hasattr(filename, "write"):
+            format = "PNG"
+
+        im.save(filename, format, **save_options)
+        return None
+
+    buffer = io.BytesIO()
+    im.save(buffer, format or "PNG", **save_options)
+    return buffer.getvalue()
+
+
+def _runs(bits):
+    """Get lengths of runs of 1s in a string of bits, or (0,) if there are none."""
+    return tuple([len(run) for run in bits.split("0") if run]) or (0,)
+
+
+def _square_flag(layer):
+    """Property for a Square attribute stored as a bit in one of its grid's row lists."""
+    def fget(self):
+        return bool(getattr(self._grid, layer)[self._row] & self._bit)
+
+    def fset(self, value):
+        rows = getattr(self._grid, layer)
+        if value:
+            rows[self._row] |= self._bit
+        else:
+            rows[self._row] &= ~self._bit
+
+    return property(fget, fset)
 
 
 class NonoGrid:
@@ -16,7 +262,12 @@ class NonoGrid:
         if self.width is None:
             self.width = height
 
-        self.squares = [[NonoGrid.Square() for s in range(self.width)] for r in range(self.height)]
+        # Squares are stored packed, one int per row for each square attribute. Column c is bit
+        # (width - 1 - c), so a row reads left to right like its binary representation.
+        self.value_rows = [0] * self.height
+        self.filled_rows = [0] * self.height
+        self.marked_rows = [0] * self.height
+        self.denied_rows = [0] * self.height
 
         self.spacer = 5
 
@@ -30,64 +281,114 @@ class NonoGrid:
 
         self.type = None
 
-    def __str__(self):
-        out = ""
+        # Seed the squares were generated from, if they were, and the generator's other keyword
+        # arguments.
+        self.seed = None
+        self.gen_kwargs = None
 
-        # Print top hints.
-        for i in range(self.max_top_hint_size):
+        # Hints, set by gen_hints.
+        self.left_hints = None
+        self.top_hints = None
 
-            # Space out left hints.
-            out += f"{' ' * (self.max_left_hint_size + 1)}"
+        # Display forms of the hints, worked out when first needed after gen_hints.
+        self._display = None
+
+        # Text form border lines, and the (left hint size, width, spacer) they were made for.
+        self._borders = None
+        self._borders_key = None
 
-            for c, col in enumerate(self.display_top_hints):
-                # Space between columns for clarity.
-                out += f" {col[i]}"
+    @property
+    def squares(self):
+        """Square views over the packed rows, indexed as squares[r][c]."""
+        return NonoGrid._SquareRows(self)
 
-                # Space every self.spacer columns, also for clarity.
-                if c != 0 and (c+1) % self.spacer == 0:
-                    out += "  "
+    @squares.setter
+    def squares(self, squares):
+        """Copy square attributes from a list of rows of squares."""
+        self.clear()
+        for r, row in enumerate(squares):
+            for c, square in enumerate(row):
+                view = NonoGrid.Square(self, r, c)
+                view.has_value = square.has_value
+                view.filled = square.filled
+                view.marked = square.marked
+                view.denied = square.denied
 
-            out += "\n"
+    def __str__(self):
+        return "".join(self._text_lines())
 
-        # Hint/top row divider.
-        # Pad out left hints, do corner, two marks per square, two marks per divider, sub one for
-        # the end.
-        # Add right corner and newline
-        out += (" " * self.max_left_hint_size) + \
-                f"{self._ul_corner}" + self._horiz_spacer * (self.grid_size()-2)+ f"{self._ur_corner}\n"
+    def write_text(self, fp):
+        """Write the grid as text to a file object, a line at a time."""
+        for line in self._text_lines():
+            fp.write(line)
 
-        for r, row in enumerate(self.squares):
+    def _text_lines(self):
+        """Generate the lines of the grid's text form, newlines included."""
+        top_border, divider, bottom_border = self._text_borders()
 
-            # Don't forget to put in left hints.
-            for lh in self.display_left_hints[r]:
-                out += lh
+        # Columns followed by an extra space, for clarity.
+        breaks = [c != 0 and (c+1) % self.spacer == 0 for c in range(self.width)]
 
-            # Divider between left hints and squares.
-            out += f"{' ' * (self.max_left_hint_size - len(self.display_left_hints[r]))}{self._vert_spacer}"
+        # Print top hints.
+        left_pad = " " * (self.max_left_hint_size + 1)
+        for i in range(self.max_top_hint_size):
+            hints = [f" {col[i]}  " if breaks[c] else f" {col[i]}"
+                     for c, col in enumerate(self.display_top_hints)]
+            yield left_pad + "".join(hints) + "\n"
 
-            for c, square in enumerate(row):
+        yield top_border
 
-                # Spacing to make things nicer.
-                if c == len(row)-1 or (c != 0 and (c+1) % self.spacer == 0):
-                    out += f" {square} {self._vert_spacer}"
+        # Square text after each column, by square state, with the divider for the end of a set
+        # of columns where there is one.
+        square_text = []
+        for c in range(self.width):
+            end = f" {self._vert_spacer}" if c == self.width - 1 or breaks[c] else ""
+            square_text.append({char: f" {char}{end}" for char in "#?X_"})
+
+        rows = zip(self.display_left_hints, self.filled_rows, self.marked_rows, self.denied_rows)
+        for r, (left_hint, filled, marked, denied) in enumerate(rows):
+            filled = format(filled, f"0{self.width}b")
+            marked = format(marked, f"0{self.width}b")
+            denied = format(denied, f"0{self.width}b")
+
+            squares = []
+            for c, text in enumerate(square_text):
+                if filled[c] == "1":
+                    squares.append(text["#"])
+                elif marked[c] == "1":
+                    squares.append(text["?"])
+                elif denied[c] == "1":
+                    squares.append(text["X"])
                 else:
-                    out += f" {square}"
+                    squares.append(text["_"])
 
-            if r != self.height - 1:
-                out += "\n"
+            # Don't forget to put in left hints, and divide them from squares.
+            padding = " " * (self.max_left_hint_size - len(left_hint))
+            yield f"{left_hint}{padding}{self._vert_spacer}{''.join(squares)}\n"
 
             # Add divider rows between squares.
             if (r+1) % self.spacer == 0 and r > 0 and r < self.height - 1:
-                out += " " * self.max_left_hint_size +\
-                        "├" + self._horiz_spacer * (self.grid_size()-2) + "┤\n"
+                yield divider
+
+        yield bottom_border
+
+    def _text_borders(self):
+        """Get the top border, row divider and bottom border lines of the text form.
 
-        # Hint/top row divider.
-        # Similar to top.
-        out += "\n"
-        out += (" " * self.max_left_hint_size) + \
-                self._ll_corner + self._horiz_spacer * (self.grid_size()-2) + f"{self._lr_corner}\n"
+        They only change with the hint size and grid width, so they're kept around until then.
+        """
+        key = (self.max_left_hint_size, self.width, self.spacer)
+        if self._borders_key != key:
+            # Pad out left hints, do corner, two marks per square, two marks per divider, sub
+            # one for the end. Add right corner and newline.
+            pad = " " * self.max_left_hint_size
+            line = self._horiz_spacer * (self.grid_size()-2)
+            self._borders = (f"{pad}{self._ul_corner}{line}{self._ur_corner}\n",
+                             f"{pad}├{line}┤\n",
+                             f"{pad}{self._ll_corner}{line}{self._lr_corner}\n")
+            self._borders_key = key
 
-        return out
+        return self._borders
 
     def grid_size(self, dim=None, square_size=1, spacer_size=1, meta_spacer_size=2):
         """Do the obnoxious calculation to get the correct width or height for grid."""
@@ -100,22 +401,77 @@ class NonoGrid:
                 (0 if dim % self.spacer == 0 else 1 * meta_spacer_size)
 
 
-    def to_picture(self, filename=None, has_value_color="white", font_name=None):
-        """Print grid to picture."""
-
-        SQUARE_SIZE = 50
-        HINT_SPACE_SIZE = 30
-        SQUARE_DIVIDER_SIZE = 5
-        SPACER_SIZE = 10
-        FONT_SIZE = 45
-
-        EMPTY = (255, 255, 255)
-        BG_GREY = (0, 0, 0)
-        DIVIDER = BG_GREY
-        PREBLOCKED_GREY = (200, 209, 211)
-
-        if filename is None:
-            filename = path.join(path.abspath(path.dirname(__file__)), "nonogrid.jpg")
+    @instrument.timed("to_picture")
+    def to_picture(self, filename=None, has_value_color="white", font_name=None, format=None,
+                   mode="RGB", **save_options):
+        """Print grid to picture.
+
+        filename can be a path or a file object to save to. Without one, the picture is returned
+        as bytes instead. format is PNG, JPEG, WEBP or anything else PIL saves, and defaults to
+        going by the filename's extension, or PNG. save_options go to PIL's Image.save, like
+        quality for JPEG and WebP or compress_level for PNG.
+
+        mode "P" draws with a palette of the few colors used, and hints without antialiasing,
+        which makes much smaller and faster PNGs than "RGB", but can't be saved as JPEG.
+        """
+        return _save(self.render(has_value_color, font_name, mode), filename, format,
+                     save_options)
+
+    @instrument.timed("to_pictures")
+    def to_pictures(self, filename=None, solved_filename=None, has_value_color="white",
+                    solved_color="orange", font_name=None, format=None, mode="RGB",
+                    **save_options):
+        """Print grid to an unsolved and a solved picture, drawing the parts they share once.
+
+        Takes the same options as to_picture, and returns a pair of bytes for the pictures
+        without a filename.
+        """
+        # The pictures only differ in the squares with values, so just repaint those in between.
+        im, value_boxes = self._render_base(font_name, mode)
+        _paint_boxes(im, value_boxes, has_value_color)
+        unsolved = _save(im, filename, format, save_options)
+
+        _paint_boxes(im, value_boxes, solved_color)
+        return unsolved, _save(im, solved_filename, format, save_options)
+
+    def render(self, has_value_color="white", font_name=None, mode="RGB"):
+        """Draw grid to a PIL Image in mode "RGB" or "P", without encoding it."""
+        im, value_boxes = self._render_base(font_name, mode)
+        _paint_boxes(im, value_boxes, has_value_color)
+        return im
+
+    @instrument.timed("to_bitmap")
+    def to_bitmap(self, filename=None, cell_size=10, format=None, **save_options):
+        """Print just the squares, black for values and white otherwise, to a 1-bit picture.
+
+        Much faster and smaller than to_picture, for bulk rendering. The picture is drawn at one
+        pixel a square straight from the row bits and scaled up to cell_size pixels a square.
+        Saving and return values work as in to_picture, and PNG keeps it lossless.
+        """
+        return _save(self.render_bitmap(cell_size), filename, format, save_options)
+
+    def render_bitmap(self, cell_size=10):
+        """Draw just the squares to a mode "1" PIL Image, without encoding it."""
+        from PIL import Image
+
+        # Mode "1" rows are padded to whole bytes, first pixel in the high bit, and "1;I"
+        # reads set bits as black.
+        pad = -self.width % 8
+        row_bytes = (self.width + pad) // 8
+        data = b"".join([(row << pad).to_bytes(row_bytes, "big") for row in self.value_rows])
+
+        im = Image.frombytes("1", (self.width, self.height), data, "raw", "1;I")
+        if cell_size == 1:
+            return im
+
+        return im.resize((self.width * cell_size, self.height * cell_size), Image.NEAREST)
+
+    def _render_base(self, font_name, mode="RGB"):
+        """Draw everything in the picture except squares with values.
+
+        Returns the image and the boxes of the squares with values, left to be filled in.
+        """
+        from PIL import Image
 
         left_hint_width = SQUARE_SIZE * (len(self.display_left_hints[0]))
         top_hint_height = SQUARE_SIZE * (len(self.display_top_hints[0]))
@@ -128,14 +484,10 @@ class NonoGrid:
                                                   spacer_size=SPACER_SIZE,
                                                   meta_spacer_size=SQUARE_DIVIDER_SIZE)
 
-        im = Image.new("RGB", (width, height), BG_GREY)
-
-        dr = ImageDraw.Draw(im)
-
-        if font_name is not None:
-            fnt = ImageFont.truetype(font_name, FONT_SIZE)
-        else:
-            fnt = ImageFont.load_default()
+        im = Image.new(mode, (width, height), BG_GREY)
+        hint_ink = _ink(im, HINT_COLOR)
+        empty_ink = _ink(im, EMPTY)
+        preblocked_ink = _ink(im, PREBLOCKED_GREY)
 
         # PIL coordinates start at the upper left corner.
 
@@ -145,38 +497,39 @@ class NonoGrid:
         for i in range(len(self.display_top_hints[0])):
 
             # Space out left hints.
-            x0 = (self.max_left_hint_size * HINT_SPACE_SIZE) + SQUARE_DIVIDER_SIZE + (SQUARE_SIZE * 0.5)
+            x0 = (self.max_left_hint_size * HINT_SPACE_SIZE) + SQUARE_DIVIDER_SIZE + (SQUARE_SIZE // 2)
 
-            for hi, item in enumerate(list(map(lambda x: x[i], self.display_top_hints))):
-                dr.text((x0, y0), item, font=fnt, fill=(255,255,255,255))
+            for hi, item in enumerate(self.display_top_hints):
+                _paste_glyph(im, x0, y0, item[i], font_name, hint_ink)
                 x0 += SQUARE_SIZE + SQUARE_DIVIDER_SIZE
 
                 if (hi+1) % 5 == 0:
                     x0 += SPACER_SIZE
 
-            y0 += HINT_SPACE_SIZE * 1.5
+            y0 += HINT_SPACE_SIZE * 3 // 2
 
         # Handle squares (and left hints).
-        for r, row in enumerate(self.squares):
+        value_boxes = []
+        full_row = (1 << self.width) - 1
+        empty_cols = self._empty_cols()
+        for r, values in enumerate(self.value_rows):
 
             x0 = SQUARE_DIVIDER_SIZE
-            for lh, hint in enumerate(self.display_left_hints[r]):
-                dr.text((x0, y0), hint, font=fnt, fill=(255,255,255,255))
+            for hint in self.display_left_hints[r]:
+                _paste_glyph(im, x0, y0, hint, font_name, hint_ink)
                 x0 += HINT_SPACE_SIZE
 
             # Space hints from squares.
             x0 += SPACER_SIZE
 
-            for c, square in enumerate(row):
-                if square.has_value:
-                    fill = has_value_color
-                elif self.top_hints[c] == [0] or self.left_hints[r] == [0]:
-                    fill = PREBLOCKED_GREY
+            preblocked = full_row if self.left_hints[r] == (0,) else empty_cols
+            for c in range(self.width):
+                bit = 1 << (self.width - 1 - c)
+                box = (x0, y0, x0+SQUARE_SIZE+1, y0+SQUARE_SIZE+1)
+                if values & bit:
+                    value_boxes.append(box)
                 else:
-                    fill = EMPTY
-
-                dr.rectangle(xy=[(x0, y0), (x0+SQUARE_SIZE, y0+SQUARE_SIZE)],
-                                              fill=fill)
+                    im.paste(preblocked_ink if preblocked & bit else empty_ink, box)
 
                 x0 += SQUARE_SIZE + SQUARE_DIVIDER_SIZE
 
@@ -190,137 +543,278 @@ class NonoGrid:
             if (r+1) % 5 == 0:
                 y0 += SPACER_SIZE
 
-        im.save(filename)
+        return im, value_boxes
 
-    def clear(self):
-        """Clear grid."""
-        for row in self.squares:
-            for square in row:
-                square.clear()
+    def _empty_cols(self):
+        """Mask of columns with no values, by their top hints."""
+        empty_cols = 0
+        for c, hint in enumerate(self.top_hints):
+            if hint == (0,):
+                empty_cols |= 1 << (self.width - 1 - c)
+
+        return empty_cols
 
+    def clear(self):
+        """Clear grid, zeroing its row lists in place."""
+        zeros = [0] * self.height
+        self.value_rows[:] = zeros
+        self.filled_rows[:] = zeros
+        self.marked_rows[:] = zeros
+        self.denied_rows[:] = zeros
+
+    def reset(self):
+        """Clear grid and forget its hints, type and seed, leaving it as good as new."""
+        self.clear()
+        self.type = None
+        self.seed = None
+        self.gen_kwargs = None
+        self.left_hints = None
+        self.top_hints = None
+        self._display = None
+
+    # Display forms of the hints, for printing. Only worked out when first used, since most
+    # grids are never printed.
+    @property
+    def display_left_hints(self):
+        return self._hints_display()[0]
+
+    @property
+    def max_left_hint_size(self):
+        return self._hints_display()[1]
+
+    @property
+    def display_top_hints(self):
+        return self._hints_display()[2]
+
+    @property
+    def max_top_hint_size(self):
+        return self._hints_display()[3]
+
+    def _hints_display(self):
+        """Get [display left hints, max left size, display top hints, max top size]."""
+        if self._display is None:
+            self.set_hints_for_display()
+
+        return self._display
+
+    @instrument.timed("set_hints_for_display")
     def set_hints_for_display(self):
         """Put padding in hints so they can be printed."""
         # Set up left hints for display (padding!).
-        self.max_left_hint_size = 1
-        self.display_left_hints = []
-        for item in self.left_hints:
-
-            new_item = ""
-            for hint in item:
-                # Space out double-digit hints for legibility.
-                if len(str(hint)) > 1:
-                    new_item += f"{self._vert_spacer}{hint}{self._vert_spacer}"
-                else:
-                    new_item += f"{hint}"
-
-            if len(new_item) > self.max_left_hint_size:
-                self.max_left_hint_size = len(new_item)
-
-            self.display_left_hints.append(new_item)
+        display_left_hints = [self._display_hint(item, self._vert_spacer)
+                              for item in self.left_hints]
+        max_left_hint_size = max([1] + [len(item) for item in display_left_hints])
 
         # Set up top hints for display (also padding!).
-        self.max_top_hint_size = 1
-        self.display_top_hints = []
-        for item in self.top_hints:
-
-            new_item = ""
-            for hint in item:
-                # Space out double-digit hints for legibility.
-                if len(str(hint)) > 1:
-                    new_item += f"{self._horiz_spacer}{hint}{self._horiz_spacer}"
-                else:
-                    new_item += f"{hint}"
-
-            if len(new_item) > self.max_top_hint_size:
-                self.max_top_hint_size = len(new_item)
-
-            self.display_top_hints.append(new_item)
+        display_top_hints = [self._display_hint(item, self._horiz_spacer)
+                             for item in self.top_hints]
+        max_top_hint_size = max([1] + [len(item) for item in display_top_hints])
 
         # Pad left hints.
-        for i, item in enumerate(self.display_left_hints):
-            self.display_left_hints[i] = f"{' ' * (self.max_left_hint_size - len(item))}{item}"
+        for i, item in enumerate(display_left_hints):
+            display_left_hints[i] = f"{' ' * (max_left_hint_size - len(item))}{item}"
 
         # Pad top hints.
-        for i, item in enumerate(self.display_top_hints):
-            self.display_top_hints[i] = f"{' ' * (self.max_top_hint_size - len(item))}{item}"
-
-    def gen_hints(self):
-        """Generate nonogram hints."""
-        self.left_hints = [[] for r in range(self.height)]
-        self.top_hints = [[] for c in range(self.width)]
-
-        # Generate hints from squares.
-        col_counts = [0] * self.width
-        for r, row in enumerate(self.squares):
-            row_count = 0
-            for c, square in enumerate(row):
-                if square.has_value:
-                    # Update counters
-                    row_count += 1
-                    col_counts[c] += 1
-
+        for i, item in enumerate(display_top_hints):
+            display_top_hints[i] = f"{' ' * (max_top_hint_size - len(item))}{item}"
+
+        self._display = [display_left_hints, max_left_hint_size,
+                         display_top_hints, max_top_hint_size]
+
+    def _display_hint(self, item, spacer):
+        """Get unpadded display form of one row or column's hints."""
+        new_item = ""
+        for hint in item:
+            # Space out double-digit hints for legibility.
+            if len(str(hint)) > 1:
+                new_item += f"{spacer}{hint}{spacer}"
+            else:
+                new_item += f"{hint}"
+
+        return new_item
+
+    def _update_display_hint(self, displays, i, item, spacer, max_size):
+        """Redo display form of one row or column's hints, returning the new max hint size.
+
+        Only that one hint gets padded, unless the max size changes and they all need it.
+        """
+        old_size = len(displays[i].lstrip(" "))
+        new_item = self._display_hint(item, spacer)
+
+        new_max = max_size
+        if len(new_item) > max_size:
+            new_max = len(new_item)
+        elif old_size == max_size and len(new_item) < max_size:
+            displays[i] = new_item
+            new_max = max([1] + [len(display.lstrip(" ")) for display in displays])
+
+        if new_max != max_size:
+            for j, display in enumerate(displays):
+                display = new_item if j == i else display.lstrip(" ")
+                displays[j] = f"{' ' * (new_max - len(display))}{display}"
+        else:
+            displays[i] = f"{' ' * (max_size - len(new_item))}{new_item}"
+
+        return new_max
+
+    def set_cell(self, r, c, value):
+        """Set whether a square has a value, updating only the hints it affects.
+
+        Recomputes just row r and column c's hints, denied squares and display hints, rather
+        than everything like gen_hints does. Negative indices count from the end, as with
+        squares.
+        """
+        if r < 0:
+            r += self.height
+        if c < 0:
+            c += self.width
+        if not (0 <= r < self.height and 0 <= c < self.width):
+            raise IndexError("square index out of range")
+
+        bit = 1 << (self.width - 1 - c)
+        if bool(self.value_rows[r] & bit) == bool(value):
+            return
+
+        if value:
+            self.value_rows[r] |= bit
+        else:
+            self.value_rows[r] &= ~bit
+
+        # Nothing to update yet.
+        if self.left_hints is None:
+            return
+
+        old_row_empty = self.left_hints[r] == (0,)
+        old_col_empty = self.top_hints[c] == (0,)
+
+        self.left_hints[r] = _runs(format(self.value_rows[r], f"0{self.width}b"))
+        col_bits = "".join("1" if row & bit else "0" for row in self.value_rows)
+        self.top_hints[c] = _runs(col_bits)
+
+        row_empty = self.left_hints[r] == (0,)
+        col_empty = self.top_hints[c] == (0,)
+
+        # Redo denied squares, for the row...
+        if row_empty != old_row_empty:
+            if row_empty:
+                self.denied_rows[r] = (1 << self.width) - 1
+            else:
+                self.denied_rows[r] = self._empty_cols()
+
+        # ...and the column.
+        if col_empty != old_col_empty:
+            for row, hint in enumerate(self.left_hints):
+                if col_empty or hint == (0,):
+                    self.denied_rows[row] |= bit
                 else:
-                    # Update tophints.
-                    if col_counts[c] > 0:
-                        self.top_hints[c].append(col_counts[c])
-                        col_counts[c] = 0
-
-                    if row_count > 0:
-                        # Update lefthints.
-                        self.left_hints[r].append(row_count)
-                        row_count = 0
+                    self.denied_rows[row] &= ~bit
 
-            # Finish row
-            if row_count > 0:
-                self.left_hints[r].append(row_count)
+        # Display hints only need keeping up to date once they've been worked out.
+        if self._display is not None:
+            display = self._display
+            display[1] = self._update_display_hint(display[0], r, self.left_hints[r],
+                                                   self._vert_spacer, display[1])
+            display[3] = self._update_display_hint(display[2], c, self.top_hints[c],
+                                                   self._horiz_spacer, display[3])
 
-            # Handle empty row.
-            if self.left_hints[r] == []:
-                self.left_hints[r] = [0]
-
-        # Handle last column.
-        for c in range(self.width):
-            if col_counts[c] > 0:
-                self.top_hints[c].append(col_counts[c])
+    @instrument.timed("gen_hints")
+    def gen_hints(self):
+        """Generate nonogram hints.
 
-            # Handle empty columns.
-            if self.top_hints[c] == []:
-                self.top_hints[c] = [0]
+        Hints are kept as a tuple of run lengths per row and column, (0,) for none. Their
+        display forms are worked out again when next needed.
+        """
+        row_bits = [format(mask, f"0{self.width}b") for mask in self.value_rows]
+        col_bits = ["".join(col) for col in zip(*row_bits)]
 
-        # Blank out empty rows.
-        for r, row in enumerate(self.squares):
-            for c, square in enumerate(self.squares[r]):
-                if 0 in self.left_hints[r] or 0 in self.top_hints[c]:
-                    square.denied = True
+        self.left_hints = [_runs(bits) for bits in row_bits]
+        self.top_hints = [_runs(bits) for bits in col_bits]
 
+        # Blank out empty rows and columns.
+        empty_cols = self._empty_cols()
+        full_row = (1 << self.width) - 1
+        for r, hint in enumerate(self.left_hints):
+            self.denied_rows[r] |= full_row if hint == (0,) else empty_cols
 
-        self.set_hints_for_display()
+        self._display = None
 
+    @instrument.timed("encode")
     def encode(self):
         """Encode bot squares to a condensed form for easy tweeting/sharing."""
-        binary_squares = []
-        for row in self.squares:
-            for square in row:
-                binary_squares.append("1" if square.has_value else "0")
+        return base64.urlsafe_b64encode(self.encode_bytes()).decode()
+
+    def encode_bytes(self):
+        """Encode bot squares to the binary form encode() wraps."""
+        header = HEADER.pack(ENCODING_VERSION, self.height, self.width)
+        return header + pack_rows(self.value_rows, self.width)
+
+    class _SquareRows:
+        """Sequence of square rows over a grid's packed storage."""
+        __slots__ = ("_grid",)
+
+        def __init__(self, grid):
+            self._grid = grid
+
+        def __len__(self):
+            return self._grid.height
+
+        def __getitem__(self, r):
+            if isinstance(r, slice):
+                return [self[i] for i in range(*r.indices(len(self)))]
+            if r < 0:
+                r += len(self)
+            if not 0 <= r < len(self):
+                raise IndexError("row index out of range")
+            return NonoGrid._SquareRow(self._grid, r)
+
+        def __iter__(self):
+            for r in range(self._grid.height):
+                yield NonoGrid._SquareRow(self._grid, r)
+
+    class _SquareRow:
+        """Sequence of square views for one row of a grid."""
+        __slots__ = ("_grid", "_row")
+
+        def __init__(self, grid, row):
+            self._grid = grid
+            self._row = row
+
+        def __len__(self):
+            return self._grid.width
+
+        def __getitem__(self, c):
+            if isinstance(c, slice):
+                return [self[i] for i in range(*c.indices(len(self)))]
+            if c < 0:
+                c += len(self)
+            if not 0 <= c < len(self):
+                raise IndexError("column index out of range")
+            return NonoGrid.Square(self._grid, self._row, c)
+
+        def __iter__(self):
+            for c in range(self._grid.width):
+                yield NonoGrid.Square(self._grid, self._row, c)
 
-        squares_binary = "".join(binary_squares)
-        squares_hex = "{:0x}".format(int(squares_binary, 2))
+    class Square:
+        """View of one square, reading and writing bits in its grid's packed rows."""
+        __slots__ = ("_grid", "_row", "_bit")
 
-        data = {"height": self.height, "width": self.width, "squares": squares_hex}
-        data_compressed = zlib.compress(str(data).encode())
-        data_encoded = base64.urlsafe_b64encode(data_compressed).decode()
+        def __init__(self, grid=None, row=0, col=0):
+            # A standalone square gets a grid of its own to live in.
+            if grid is None:
+                grid = NonoGrid(1)
 
-        return f"{data_encoded}"
+            self._grid = grid
+            self._row = row
+            self._bit = 1 << (grid.width - 1 - col)
 
-    class Square:
-        def __init__(self):
-            # User indicators.
-            self.filled = False
-            self.marked = False
-            self.denied = False
+        # User indicators.
+        filled = _square_flag("filled_rows")
+        marked = _square_flag("marked_rows")
+        denied = _square_flag("denied_rows")
 
-            # True info.
-            self.has_value = False
+        # True info.
+        has_value = _square_flag("value_rows")
 
         def __str__(self):
             if self.filled:
@@ -339,38 +833,71 @@ class NonoGrid:
             self.has_value = False
 
 
-def decode(nonostring):
-    """Restore NonoGrid from condensed form."""
+@instrument.timed("decode")
+def decode(nonostring, grid=None, pool=None):
+    """Restore NonoGrid from condensed form.
 
+    If grid is given, it's reset and decoded into rather than making a new one, and must be the
+    right size. Otherwise, if pool is given, the grid is checked out of that GridPool.
+    """
     decoded = base64.urlsafe_b64decode(nonostring)
-    uncompressed = zlib.decompress(decoded).decode().replace("'", '"')
-    redict = json.loads(uncompressed)
-    height = redict["height"]
-    width = redict["width"]
-    size = height * width
-    unpadded_binary = redict["squares"]
+    if decoded[:1] == bytes([_ZLIB_HEADER]):
+        return _decode_zlib(decoded, grid, pool)
+
+    return decode_bytes(decoded, grid, pool)
+
+
+def decode_bytes(data, grid=None, pool=None):
+    """Restore NonoGrid from the binary form, given as bytes or any buffer like a memoryview.
 
-    grid = NonoGrid(height, width)
+    grid and pool are as for decode.
+    """
+    data = memoryview(data)
+    try:
+        version, height, width = HEADER.unpack_from(data)
+    except struct.error:
+        raise ValueError(f"Puzzle of {len(data)} bytes is too short for a header") from None
 
-    unpadded_binary = str(bin(int(unpadded_binary, 16))[2:])
-    padded_binary = unpadded_binary.zfill(size)
+    if version != ENCODING_VERSION:
+        raise ValueError(f"Unknown encoding version {version}")
 
-    squares = []
-    row = []
-    for c, char in enumerate(padded_binary):
+    # Unpacked before touching the grid, so bad data leaves it as it was.
+    value_rows = unpack_rows(data[HEADER.size:], height, width)
+    grid = _grid_to_decode_into(grid, height, width, pool)
+    grid.value_rows[:] = value_rows
+
+    return grid
 
-        if c % width == 0 and c != 0:
-            squares.append(row)
-            row = []
 
-        square = NonoGrid.Square()
-        if char == '1':
-            square.has_value = True
+def _grid_to_decode_into(grid, height, width, pool=None):
+    """Reset a grid to decode into, checking its size, or get one from pool or make one."""
+    if grid is None:
+        return NonoGrid(height, width) if pool is None else pool.get(height, width)
 
-        row.append(square)
+    if (grid.height, grid.width) != (height, width):
+        raise ValueError(f"Can't decode a {height}x{width} puzzle into a "
+                         f"{grid.height}x{grid.width} grid")
+
+    grid.reset()
+    return grid
 
-    squares.append(row)
 
-    grid.squares = squares
+def _decode_zlib(decoded, grid=None, pool=None):
+    """Restore NonoGrid from the original zlib-compressed dict form."""
+    uncompressed = zlib.decompress(decoded).decode().replace("'", '"')
+    redict = json.loads(uncompressed)
+    height = redict["height"]
+    width = redict["width"]
+    unpadded_binary = redict["squares"]
+
+    size = height * width
+    value_rows = [0] * height
+    if size:
+        squares_binary = format(int(unpadded_binary, 16), f"0{size}b")
+        value_rows = [int(squares_binary[start:start + width], 2)
+                      for start in range(0, size, width)]
+
+    grid = _grid_to_decode_into(grid, height, width, pool)
+    grid.value_rows[:] = value_rows
 
     return grid
@@ -1,39 +1,408 @@
+import functools
+import io
 import random
+import time
+from collections import OrderedDict
 
-from nonogen.perlin import PerlinNoiseFactory
+import numpy as np
 
-def gen_random(nonogrid):
+from nonogen import instrument
+from nonogen.nono import NonoGrid
+from nonogen.rng import as_generator, as_random, is_seed
+from nonogen.solve import solve_grid
+
+# PIL and the Perlin noise module are imported by the generators that use them, so the others
+# don't pay for importing them.
+
+
+def _pack_rows(bits):
+    """Pack a 2D boolean array into one int per row, first column most significant."""
+    width = bits.shape[1]
+    pad = -width % 8
+    return [int.from_bytes(row.tobytes(), "big") >> pad for row in np.packbits(bits, axis=1)]
+
+def _seeded(nonogrid, rng):
+    """Pick a puzzle's seed from an rng argument, record it on the grid, and get an RNG for it.
+
+    A seed is used as is; otherwise one is drawn from the rng.
+    """
+    seed = rng if is_seed(rng) else as_random(rng).getrandbits(64)
+    nonogrid.seed = seed
+    return random.Random(seed)
+
+# Generator name, as recorded in a grid's type, to generator.
+GENERATORS = {}
+
+def generator(name, register=True, seeded=True):
+    """Decorator making a grid generator from a function that makes a whole grid's bits at once.
+
+    The function is called as func(height, width, rng, **kwargs), with rng a random.Random seeded
+    for the puzzle, and returns a height by width boolean array of which squares get values.
+
+    The grid generator made from it is called as gen(nonogrid, rng=None, **kwargs). It records
+    the puzzle's type (name), seed and kwargs on the grid, and is added to GENERATORS unless
+    register is False. rng can be a seed, a random.Random or a NumPy Generator; by default it's
+    the random module. If seeded is False, no seed is picked and rng goes to the function as is,
+    for generators that don't use it. The original function stays available as gen.bits, for
+    generators building on it.
+    """
+    def decorator(func):
+        @instrument.timed(func.__name__)
+        @functools.wraps(func)
+        def gen(nonogrid, rng=None, **kwargs):
+            nonogrid.clear()
+            if seeded:
+                puzzle_rng = _seeded(nonogrid, rng)
+            else:
+                nonogrid.seed = None
+                puzzle_rng = rng
+
+            bits = func(nonogrid.height, nonogrid.width, puzzle_rng, **kwargs)
+            nonogrid.value_rows[:] = _pack_rows(np.asarray(bits, dtype=bool))
+
+            nonogrid.type = name
+            nonogrid.gen_kwargs = kwargs
+
+        gen.bits = func
+        if register:
+            GENERATORS[name] = gen
+
+        return gen
+
+    return decorator
+
+def generator_name(name):
+    """Find a generator's name in GENERATORS, ignoring case. Raises ValueError if there's none.
+
+    Everything taking a generator by name goes through this, so "perlin" and "Perlin" both work.
+    """
+    for gen_name in GENERATORS:
+        if gen_name.lower() == name.lower():
+            return gen_name
+
+    raise ValueError(f"unknown generator {name}, choose from {', '.join(GENERATORS)}")
+
+@generator("Random")
+def gen_random(height, width, rng):
     """Generate nonogrid completely at random."""
-    nonogrid.clear()
+    size = height * width
+    if not size:
+        return np.zeros((height, width), dtype=bool)
 
-    for row in nonogrid.squares:
-        for square in row:
-            if random.randint(0, 1) == 0:
-                square.has_value = True
+    # One random bit per square, all drawn at once, first square in the high bit.
+    pad = -size % 8
+    squares = rng.getrandbits(size) << pad
+    bits = np.unpackbits(np.frombuffer(squares.to_bytes((size + pad) // 8, "big"), np.uint8))
+    return bits[:size].reshape(height, width)
 
-    nonogrid.type = "Random"
+@generator("Perlin")
+def gen_perlin(height, width, rng, arbitrary=11, res=40, threshold=0):
+    """Generate nonogrid using perlin noise.
 
-def gen_perlin(nonogrid):
-    """Generate nonogrid using perlin noise."""
-    nonogrid.clear()
+    Squares where the noise is below threshold get values.
+    """
+    from nonogen.perlin import PerlinNoiseFactory
 
-    # experiment with this, probably.
-    arbitrary = 11
-    x_size = arbitrary * len(nonogrid.squares[0])
-    y_size = arbitrary * len(nonogrid.squares)
-    res = 40
+    # experiment with these, probably.
+    x_size = arbitrary * width
+    y_size = arbitrary * height
     x_space_range = x_size//res
     y_space_range = y_size//res
 
-    pnf = PerlinNoiseFactory(2, octaves=8, tile=(x_space_range, y_space_range))
+    pnf = PerlinNoiseFactory(2, octaves=8, tile=(x_space_range, y_space_range), rng=rng)
+
+    x_step = x_size // width
+    y_step = y_size // height
+    xs = [x/res for x in range(0, x_size, x_step)]
+    ys = [y/res for y in range(0, y_size, y_step)]
+    n = pnf.field(xs, ys)
+
+    # Split nice perlin noise into blunt black/white.
+    return n.T < threshold
+
+
+class NoiseFieldCache:
+    """Bounded LRU cache of Perlin noise sampled over one whole tile, for grids to share."""
+    def __init__(self, maxsize=8, strip=128):
+        self.maxsize = maxsize
+        self.strip = strip
+        self.fields = OrderedDict()
+
+    def get(self, tile, res, octaves=8, seed=0):
+        """Get noise tiling every tile units, sampled every 1/res units, indexed [x, y].
+
+        Computed on first use, which costs much more than one gen_perlin call, since it covers
+        the whole tile rather than just the points a grid samples. Each field holds
+        tile[0] * tile[1] * res ** 2 floats, 8 bytes each.
+        """
+        key = (tile, res, octaves, seed)
+        field = self.fields.get(key)
+        if field is not None:
+            self.fields.move_to_end(key)
+            return field
+
+        from nonogen.perlin import PerlinNoiseFactory
+
+        # Sampling a whole tile touches most of the highest octaves' lattices, which would take
+        # far more memory than the field itself to store gradients for, so they're hashed.
+        pnf = PerlinNoiseFactory(len(tile), octaves=octaves, tile=tile, hashed=True, rng=seed)
+
+        # Hashed noise is the same whatever else gets sampled, so the field can be made a strip
+        # at a time, keeping the temporary arrays small next to it.
+        axes = [np.arange(t * res) / res for t in tile]
+        field = np.empty(tuple(len(axis) for axis in axes))
+        for start in range(0, len(axes[0]), self.strip):
+            field[start:start + self.strip] = pnf.field(axes[0][start:start + self.strip],
+                                                        *axes[1:])
+
+        self.fields[key] = field
+        if len(self.fields) > self.maxsize:
+            self.fields.popitem(last=False)
+
+        return field
+
+NOISE_FIELDS = NoiseFieldCache()
+
+@generator("CachedPerlin")
+def gen_perlin_cached(height, width, rng, arbitrary=11, res=40, threshold=0, field_seed=0,
+                      cache=NOISE_FIELDS):
+    """Generate nonogrid from a cached perlin noise field shared by grids of the same size.
+
+    Samples like gen_perlin, but from a random offset into a tiling field from the cache, going
+    either way along each axis. After the first grid of a size, the rest cost next to nothing.
+    Grids too small for the noise to tile are generated like gen_perlin.
+
+    The cached field for a size is about arbitrary * height by arbitrary * width floats, so 10MB
+    for 100x100 with the defaults, and the cache keeps up to maxsize of them. Each worker
+    process has its own cache. The first grid of a size takes longer than gen_perlin, about
+    0.7s at 100x100.
+    """
+    x_space_range = arbitrary * width // res
+    y_space_range = arbitrary * height // res
+    if not x_space_range or not y_space_range:
+        return gen_perlin.bits(height, width, rng, arbitrary=arbitrary, res=res,
+                               threshold=threshold)
+
+    field = cache.get((x_space_range, y_space_range), res, seed=field_seed)
+
+    indices = []
+    for count, period in zip((width, height), field.shape):
+        offset = rng.randrange(period)
+        step = -arbitrary if rng.getrandbits(1) else arbitrary
+        indices.append((offset + step * np.arange(count)) % period)
+
+    n = field[np.ix_(*indices)]
+
+    # Split nice perlin noise into blunt black/white.
+    return n.T < threshold
+
+@generator("Cellular")
+def gen_cellular(height, width, rng, fill=0.55, steps=3, birth=5, survive=4):
+    """Generate nonogrid by smoothing random squares with a cellular automaton.
+
+    Squares start with values with probability fill. Then each step, a square without a value
+    gets one if at least birth of its eight neighbors have values, and a square with a value
+    keeps it if at least survive do. Squares off the grid count as without values.
+    """
+    bits = as_generator(rng).random((height, width)) < fill
+
+    for _ in range(steps):
+        padded = np.pad(bits, 1).astype(np.uint8)
+        neighbors = sum(padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width]
+                        for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dy or dx)
+        bits = np.where(bits, neighbors >= survive, neighbors >= birth)
+
+    return bits
+
+@generator("Symmetric")
+def gen_symmetric(height, width, rng, symmetry="vertical", base="Cellular", **kwargs):
+    """Generate nonogrid mirrored from part of it generated by another generator.
+
+    symmetry is "vertical" to mirror the left half onto the right, "horizontal" to mirror the top
+    half onto the bottom, or "both". base names the generator for the part, in GENERATORS and
+    in any case, and extra keyword arguments go to it.
+    """
+    if symmetry not in ("vertical", "horizontal", "both"):
+        raise ValueError(f"Unknown symmetry {symmetry}")
+
+    mirror_x = symmetry in ("vertical", "both")
+    mirror_y = symmetry in ("horizontal", "both")
+
+    # The middle row or column of odd sizes belongs to both halves.
+    part_width = (width + 1) // 2 if mirror_x else width
+    part_height = (height + 1) // 2 if mirror_y else height
+    bits = GENERATORS[generator_name(base)].bits(part_height, part_width, rng, **kwargs)
+
+    if mirror_x:
+        bits = np.hstack([bits, bits[:, :width // 2][:, ::-1]])
+    if mirror_y:
+        bits = np.vstack([bits, bits[:height // 2][::-1]])
+
+    return bits
+
+def _open_image(image):
+    """Open an image argument, as gen_image describes it, as a PIL Image."""
+    from PIL import Image
+
+    if isinstance(image, (bytes, bytearray)):
+        image = io.BytesIO(image)
+    if not isinstance(image, Image.Image):
+        image = Image.open(image)
+
+    return image
+
+def _image_bits(image, height, width, threshold):
+    """Scale a picture down to one pixel a square, as a mode "1" image of squares with values.
+
+    threshold is as for gen_image.
+    """
+    from PIL import Image
+
+    # JPEGs can decode straight to greyscale at down to 1/8 size, which is much cheaper than
+    # decoding every pixel just to average them away. Others ignore this.
+    image.draft("L", (width, height))
+
+    # Reduce by whole factors first, which is cheap on big pictures, then resize the rest of
+    # the way averaging the pixels each square covers.
+    small = image.convert("L").resize((width, height), Image.BOX, reducing_gap=3.0)
+    return small.point(lambda v: 255 if v < threshold else 0, "1")
+
+@generator("Image", register=False, seeded=False)
+def gen_image(height, width, rng, image=None, threshold=128):
+    """Generate nonogrid from a picture, scaled down to one pixel a square.
+
+    Squares where the picture is darker than threshold, out of 255, get values. image is a PIL
+    Image, or a filename, file object or bytes to open one from. The rng isn't used, so no seed
+    is drawn or recorded, and since the puzzle can't be regenerated without the picture, this
+    isn't in GENERATORS.
+    """
+    if image is None:
+        raise ValueError("gen_image needs an image")
+
+    image = _open_image(image)
+    if not height or not width:
+        return np.zeros((height, width), dtype=bool)
+
+    return np.asarray(_image_bits(image, height, width, threshold))
+
+def from_image(image, height, width=None, threshold=128):
+    """Make a NonoGrid from a picture, scaled down to one pixel a square.
+
+    image and threshold are as for gen_image, and width defaults to keeping the picture's aspect
+    ratio. Big JPEGs are only decoded at the size needed.
+    """
+    image = _open_image(image)
+    if width is None:
+        width = max(1, round(height * image.width / image.height))
+
+    nonogrid = NonoGrid(height, width)
+    nonogrid.type = "Image"
+    if not height or not width:
+        return nonogrid
+
+    # Mode "1" rows come out packed eight squares to a byte, first square in the high bit,
+    # padded to whole bytes, so they only need shifting into row bitmasks.
+    data = _image_bits(image, height, width, threshold).tobytes()
+    row_bytes = (width + 7) // 8
+    pad = -width % 8
+    nonogrid.value_rows = [int.from_bytes(data[start:start + row_bytes], "big") >> pad
+                           for start in range(0, height * row_bytes, row_bytes)]
+
+    return nonogrid
+
+
+def regenerate(nonogrid):
+    """Regenerate a grid's squares from its recorded type, seed and generator kwargs."""
+    GENERATORS[nonogrid.type](nonogrid, rng=nonogrid.seed, **(nonogrid.gen_kwargs or {}))
+
+
+class GenStats:
+    """Running statistics for gen_unique."""
+    def __init__(self):
+        self.attempts = 0
+        self.accepted = 0
+
+        # Rejected attempts, by reason.
+        self.rejected = {}
+
+        # Seconds spent in each stage.
+        self.times = {"generate": 0.0, "hints": 0.0, "solve": 0.0}
+
+    def __str__(self):
+        lines = [f"{self.accepted}/{self.attempts} accepted ({self.acceptance_rate:.1%}), "
+                 f"{self.attempts_per_accepted:.2f} attempts per accepted puzzle"]
+
+        for reason, count in sorted(self.rejected.items()):
+            lines.append(f"  rejected {reason}: {count}")
+
+        for stage, seconds in self.times.items():
+            per = seconds / self.attempts if self.attempts else 0
+            lines.append(f"  {stage}: {seconds:.3f}s total, {per * 1000:.2f}ms per attempt")
+
+        return "\n".join(lines)
+
+    @property
+    def acceptance_rate(self):
+        return self.accepted / self.attempts if self.attempts else 0
+
+    @property
+    def attempts_per_accepted(self):
+        return self.attempts / self.accepted if self.accepted else float("inf")
+
+    def reject(self, reason):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
+
+def is_trivial(nonogrid, min_fill=0.1):
+    """Check if a grid has too few or too many squares with values to be worth solving."""
+    size = nonogrid.height * nonogrid.width
+    filled = sum(bin(row).count("1") for row in nonogrid.value_rows)
+    return filled < size * min_fill or filled > size * (1 - min_fill)
+
+
+def gen_unique(nonogrid, gen=gen_perlin, max_attempts=100, stats=None, min_fill=0.1,
+               difficulty=None, **kwargs):
+    """Generate into nonogrid with gen until it holds a nontrivial puzzle with one solution.
+
+    Extra keyword arguments go to gen. An rng argument, which can be a seed, is made into one
+    source of randomness for all the attempts, so each tries a different puzzle but the whole run
+    is reproducible from the seed. The grid is reused for every attempt. Returns the solver
+    result for the accepted puzzle, with its difficulty, or None if every attempt was rejected.
+    If stats is given, it's a GenStats to record attempts and timings in.
+
+    difficulty can be a (min, max) band of difficulty scores to accept. Solving stops as soon as
+    a puzzle goes over the max, so hard puzzles are rejected cheaply.
+    """
+    min_score, max_score = difficulty or (None, None)
+    if stats is None:
+        stats = GenStats()
+
+    kwargs["rng"] = as_random(kwargs.get("rng"))
+    for _ in range(max_attempts):
+        stats.attempts += 1
+
+        start = time.perf_counter()
+        gen(nonogrid, **kwargs)
+        generated = time.perf_counter()
+        stats.times["generate"] += generated - start
+
+        if is_trivial(nonogrid, min_fill):
+            stats.reject("trivial")
+            continue
+
+        nonogrid.gen_hints()
+        hinted = time.perf_counter()
+        stats.times["hints"] += hinted - generated
 
-    x_step = x_size // len(nonogrid.squares[0])
-    y_step = y_size // len(nonogrid.squares)
-    for x in range(0, x_size, x_step):
-        for y in range(0, y_size, y_step):
-            n = pnf(x/res, y/res)
+        result = solve_grid(nonogrid, max_score=max_score)
+        stats.times["solve"] += time.perf_counter() - hinted
 
-            # Split nice perlin noise into blunt black/white.
-            nonogrid.squares[y//x_step][x//y_step].has_value = n < 0
+        if not result.unique:
+            stats.reject(result.status)
+        elif min_score is not None and result.difficulty.score < min_score:
+            stats.reject("too easy")
+        else:
+            stats.accepted += 1
+            return result
 
-    nonogrid.type = "Perlin"
+    return None
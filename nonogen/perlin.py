@@ -3,7 +3,24 @@
 # Licensed under ISC
 from itertools import product
 import math
-import random
+
+import numpy as np
+
+from nonogen import instrument
+from nonogen.rng import as_generator, as_random
+
+
+# Eager factories refuse to fill a lattice of more gradients than this; at
+# 2 dimensions it's 32MB.  The highest octave's lattice grows with 4 ** octaves
+# times the tile area, so big tiles need hashed gradients instead.
+MAX_EAGER_GRADIENTS = 1 << 21
+
+# Hashed factories pick each grid point's gradient out of a table of this many
+# random ones, 2 ** HASHED_GRADIENT_BITS, by hashing the point.
+HASHED_GRADIENT_BITS = 10
+
+# Odd 64-bit constant for mixing coordinates into a hash.
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
 
 
 def smoothstep(t):
@@ -24,10 +41,11 @@ class PerlinNoiseFactory(object):
     integers.
 
     There is no limit to the coordinates used; new gradients are generated on
-    the fly as necessary.
+    the fly as necessary, unless the factory is eager or hashed.
     """
 
-    def __init__(self, dimension, octaves=1, tile=(), unbias=False):
+    def __init__(self, dimension, octaves=1, tile=(), unbias=False, eager=False, hashed=False,
+                 rng=None):
         """Create a new Perlin noise factory in the given number of dimensions,
         which should be an integer and at least 1.
 
@@ -44,8 +62,23 @@ class PerlinNoiseFactory(object):
         If ``unbias`` is true, the smoothstep function will be applied to the
         output before returning it, to counteract some of Perlin noise's
         significant bias towards the center of its output range.
+
+        If ``eager`` is true, every dimension must tile, and the gradients for
+        the whole tiled lattice are generated up front into a dense array
+        instead of on demand.  This costs memory proportional to the lattice
+        of the highest octave, but takes the gradient lookups out of sampling.
+        Lattices of over MAX_EAGER_GRADIENTS gradients raise ValueError.
+
+        If ``hashed`` is true, each grid point's gradient is picked out of a
+        small fixed table by hashing its coordinates, so nothing is stored per
+        grid point.  Memory stays constant however much noise is sampled, at
+        the cost of gradients repeating among the table's few directions.
+
+        ``rng`` is where gradients come from: a seed, a ``random.Random``, or
+        a NumPy ``Generator``.  By default it's the ``random`` module.
         """
         self.dimension = dimension
+        self.rng = as_random(rng)
         self.octaves = octaves
         self.tile = tile + (0,) * dimension
         self.unbias = unbias
@@ -54,7 +87,44 @@ class PerlinNoiseFactory(object):
         # by this to scale to ±1
         self.scale_factor = 2 * dimension ** -0.5
 
+        # Lazily made gradients, by the key of their grid point (see
+        # _point_key).  field() keeps them as sorted keys and an array of the
+        # gradients in the same order, to look up in bulk.  The scalar path
+        # adds to a dict instead, since adding to the arrays copies them; its
+        # new keys are merged into the arrays when field() next needs them.
         self.gradient = {}
+        self._keys = np.empty(0, dtype=np.int64)
+        self._gradients = np.empty((0, dimension))
+        self._unsorted_keys = []
+        self.gradient_lattice = None
+
+        self._gradient_table = None
+        if hashed:
+            if eager:
+                raise ValueError("Gradients can't be both eager and hashed")
+
+            self._gradient_table = self._generate_gradients(1 << HASHED_GRADIENT_BITS)
+            self._hash_key = self.rng.getrandbits(64)
+
+        # Offsets from a point's grid cell to each of its corners, in the
+        # order product() produces them.
+        self._corners = list(product((0, 1), repeat=dimension))
+
+        if eager:
+            if not all(self.tile[:dimension]):
+                raise ValueError("Eager gradients need every dimension tiled")
+
+            # All octaves share the one lattice, just as they share the lazy
+            # gradient table; the highest octave reaches the furthest, up to
+            # and including tile * 2 ** (octaves - 1) in each dimension.
+            top = 1 << (octaves - 1)
+            shape = tuple(t * top + 1 for t in self.tile[:dimension])
+            if math.prod(shape) > MAX_EAGER_GRADIENTS:
+                raise ValueError(f"Eager lattice of {math.prod(shape)} gradients is too "
+                                 f"big, use hashed gradients instead")
+
+            self.gradient_lattice = self._generate_gradients(
+                math.prod(shape)).reshape(shape + (dimension,))
 
     def _generate_gradient(self):
         # Generate a random unit vector at each grid point -- this is the
@@ -63,17 +133,105 @@ class PerlinNoiseFactory(object):
         # 1 dimension is special, since the only unit vector is trivial;
         # instead, use a slope between -1 and 1
         if self.dimension == 1:
-            return (random.uniform(-1, 1),)
+            return (self.rng.uniform(-1, 1),)
 
         # Generate a random point on the surface of the unit n-hypersphere;
         # this is the same as a random unit vector in n dimensions.  Thanks
         # to: http://mathworld.wolfram.com/SpherePointPicking.html
         # Pick n normal random variables with stddev 1
-        random_point = [random.gauss(0, 1) for _ in range(self.dimension)]
+        random_point = [self.rng.gauss(0, 1) for _ in range(self.dimension)]
         # Then scale the result to a unit vector
         scale = sum(n * n for n in random_point) ** -0.5
         return tuple(coord * scale for coord in random_point)
 
+    def _generate_gradients(self, count):
+        # Same as _generate_gradient, but for many grid points at once, drawn
+        # through NumPy.  Unless rng is already a NumPy Generator, the batch
+        # comes from one seeded off it, so seeding rng still makes the noise
+        # reproducible.
+        rng = as_generator(self.rng)
+
+        if self.dimension == 1:
+            return rng.uniform(-1, 1, (count, 1))
+
+        random_points = rng.standard_normal((count, self.dimension))
+        scale = (random_points * random_points).sum(axis=1) ** -0.5
+        return random_points * scale[:, np.newaxis]
+
+    def _point_key(self, grid_point):
+        # One int64 key for a grid point, packing together its coordinates.
+        bits = 63 // self.dimension
+        offset = 1 << (bits - 1)
+        key = 0
+        for coord in grid_point:
+            if not -offset <= coord < offset:
+                raise ValueError("Coordinates too far from the origin")
+            key = (key << bits) | (coord + offset)
+        return key
+
+    def _point_keys(self, points):
+        # Same as _point_key, for grid points given as one broadcastable
+        # integer array per dimension.
+        bits = 63 // self.dimension
+        offset = 1 << (bits - 1)
+        key = 0
+        for coord in points:
+            if coord.size and (coord.min() < -offset or coord.max() >= offset):
+                raise ValueError("Coordinates too far from the origin")
+            key = (key << bits) | (coord + offset)
+        return key
+
+    def _add_sorted(self, keys, gradients):
+        # Merge new keys and their gradients into the sorted arrays.
+        order = np.argsort(np.concatenate((self._keys, keys)), kind="stable")
+        self._keys = np.concatenate((self._keys, keys))[order]
+        self._gradients = np.concatenate((self._gradients, gradients))[order]
+
+    def _sorted_gradient(self, key):
+        # The gradient field() made for one point key, or None.
+        i = self._keys.searchsorted(key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return tuple(self._gradients[i].tolist())
+        return None
+
+    def _lookup_gradients(self, keys):
+        # Gradients at each of an array of point keys, as an array of the
+        # same shape plus a last axis for the vector.  Missing ones are
+        # generated in the order they first appear in keys.
+        if self._unsorted_keys:
+            self._add_sorted(np.array(self._unsorted_keys, dtype=np.int64),
+                             np.array([self.gradient[key] for key in self._unsorted_keys]))
+            self._unsorted_keys = []
+
+        flat = np.ravel(keys)
+        index = np.searchsorted(self._keys, flat)
+        found = index < len(self._keys)
+        found[found] = self._keys[index[found]] == flat[found]
+
+        missing = flat[~found]
+        if instrument.enabled:
+            instrument.count("perlin_gradient_hits", len(flat) - len(missing))
+            instrument.count("perlin_gradient_misses", len(missing))
+
+        if missing.size:
+            _, first = np.unique(missing, return_index=True)
+            missing = missing[np.sort(first)]
+            self._add_sorted(missing, self._generate_gradients(len(missing)))
+            index = np.searchsorted(self._keys, flat)
+
+        return self._gradients[index].reshape(np.shape(keys) + (self.dimension,))
+
+    def _hashed_gradients(self, points):
+        # Gradients at grid points given as one broadcastable integer array
+        # per dimension, from the table by a hash of the point and the key.
+        # Multiplying leaves the top bits the best mixed, so those pick the
+        # gradient, and get shifted down to mix with the next coordinate.
+        h = np.uint64(self._hash_key)
+        for coord in points:
+            h = (h ^ h >> np.uint64(32) ^ np.asarray(coord).astype(np.uint64)) * _HASH_MULTIPLIER
+        index = (h >> np.uint64(64 - HASHED_GRADIENT_BITS)).astype(np.intp)
+        return self._gradient_table.take(index, axis=0)
+
     def get_plain_noise(self, *point):
         """Get plain noise for a single point, without taking into account
         either octaves or tiling.
@@ -82,22 +240,42 @@ class PerlinNoiseFactory(object):
             raise ValueError("Expected {} values, got {}".format(
                 self.dimension, len(point)))
 
-        # Build a list of the (min, max) bounds in each dimension
-        grid_coords = []
-        for coord in point:
-            min_coord = math.floor(coord)
-            max_coord = min_coord + 1
-            grid_coords.append((min_coord, max_coord))
+        # The min bound in each dimension; the max is always one more.
+        min_coords = [math.floor(coord) for coord in point]
 
         # Compute the dot product of each gradient vector and the point's
         # distance from the corresponding grid point.  This gives you each
         # gradient's "influence" on the chosen point.
-        dots = []
-        for grid_point in product(*grid_coords):
-            if grid_point not in self.gradient:
-                self.gradient[grid_point] = self._generate_gradient()
-            gradient = self.gradient[grid_point]
+        grid_points = [tuple(lo + offset for lo, offset in zip(min_coords, corner))
+                       for corner in self._corners]
+        if self.gradient_lattice is not None:
+            gradients = [self.gradient_lattice[gp].tolist() for gp in grid_points]
+        elif self._gradient_table is not None:
+            gradients = self._hashed_gradients(
+                np.array(grid_points, dtype=np.int64).T).tolist()
+        else:
+            # One point at a time, a dict beats NumPy's per-call overhead,
+            # and adding to it doesn't copy the whole table.
+            gradients = []
+            misses = 0
+            for grid_point in grid_points:
+                key = self._point_key(grid_point)
+                gradient = self.gradient.get(key)
+                if gradient is None:
+                    gradient = self._sorted_gradient(key)
+                    if gradient is None:
+                        gradient = self._generate_gradient()
+                        self._unsorted_keys.append(key)
+                        misses += 1
+                    self.gradient[key] = gradient
+                gradients.append(gradient)
+
+            if instrument.enabled:
+                instrument.count("perlin_gradient_hits", len(grid_points) - misses)
+                instrument.count("perlin_gradient_misses", misses)
 
+        dots = []
+        for grid_point, gradient in zip(grid_points, gradients):
             dot = 0
             for i in range(self.dimension):
                 dot += gradient[i] * (point[i] - grid_point[i])
@@ -114,20 +292,106 @@ class PerlinNoiseFactory(object):
         dim = self.dimension
         while len(dots) > 1:
             dim -= 1
-            s = smoothstep(point[dim] - grid_coords[dim][0])
+            s = smoothstep(point[dim] - min_coords[dim])
+
+            dots = [lerp(s, dots[i], dots[i + 1])
+                    for i in range(0, len(dots), 2)]
 
-            next_dots = []
-            while dots:
-                next_dots.append(lerp(s, dots.pop(0), dots.pop(0)))
+        return dots[0] * self.scale_factor
+
+    def get_plain_noise_field(self, *axes):
+        """Get plain noise for every point of the lattice spanned by the given
+        coordinate arrays, one per dimension, without taking into account
+        either octaves or tiling.  Matches get_plain_noise point for point.
+        """
+        if len(axes) != self.dimension:
+            raise ValueError("Expected {} axes, got {}".format(
+                self.dimension, len(axes)))
 
-            dots = next_dots
+        # Grid cell bounds along each axis, and every grid coordinate any
+        # point on that axis touches.
+        mins = [np.floor(axis).astype(np.int64) for axis in axes]
+        coords = [np.unique(np.concatenate((lo, lo + 1))) for lo in mins]
+
+        # Dense table of the gradients at every grid point we need.  Hashed
+        # gradients are cheap enough to work out for each corner instead.
+        if self.gradient_lattice is not None:
+            gradients = self.gradient_lattice[np.ix_(*coords)]
+        elif self._gradient_table is None:
+            keys = self._point_keys(np.ix_(*coords))
+            gradients = self._lookup_gradients(keys)
+
+        # Dot products for each corner, in the same order product() gives
+        # get_plain_noise, each an array over the whole lattice.
+        dots = []
+        for corner in self._corners:
+            grid_points = [lo + offset for lo, offset in zip(mins, corner)]
+            if self._gradient_table is not None:
+                gradient = self._hashed_gradients(np.ix_(*grid_points))
+            else:
+                index = np.ix_(*(np.searchsorted(c, gp)
+                                 for c, gp in zip(coords, grid_points)))
+                gradient = gradients[index]
+
+            dot = 0
+            for i in range(self.dimension):
+                shape = [1] * self.dimension
+                shape[i] = -1
+                distance = (axes[i] - grid_points[i]).reshape(shape)
+                dot = dot + gradient[..., i] * distance
+            dots.append(dot)
+
+        # Interpolate adjacent pairs, collapsing the last dimension first.
+        dim = self.dimension
+        while len(dots) > 1:
+            dim -= 1
+            shape = [1] * self.dimension
+            shape[dim] = -1
+            s = smoothstep((axes[dim] - mins[dim]).reshape(shape))
+
+            dots = [lerp(s, dots[i], dots[i + 1])
+                    for i in range(0, len(dots), 2)]
 
         return dots[0] * self.scale_factor
 
+    def field(self, *axes):
+        """Get the value of this Perlin noise function at every point of the
+        lattice spanned by the given coordinate arrays, one per dimension.
+        Returns an array indexed the same way as the axes, so that
+        ``pnf.field(xs, ys)[i, j] == pnf(xs[i], ys[j])``.
+        """
+        axes = [np.asarray(axis, dtype=float) for axis in axes]
+        if instrument.enabled:
+            instrument.count("perlin_samples", math.prod(len(axis) for axis in axes))
+
+        ret = 0
+        for o in range(self.octaves):
+            o2 = 1 << o
+            new_axes = []
+            for i, axis in enumerate(axes):
+                axis = axis * o2
+                if self.tile[i]:
+                    axis = axis % (self.tile[i] * o2)
+                new_axes.append(axis)
+            ret = ret + self.get_plain_noise_field(*new_axes) / o2
+
+        ret /= 2 - 2 ** (1 - self.octaves)
+
+        if self.unbias:
+            r = (ret + 1) / 2
+            for _ in range(int(self.octaves / 2 + 0.5)):
+                r = smoothstep(r)
+            ret = r * 2 - 1
+
+        return ret
+
     def __call__(self, *point):
         """Get the value of this Perlin noise function at the given point.  The
         number of values given should match the number of dimensions.
         """
+        if instrument.enabled:
+            instrument.count("perlin_samples")
+
         ret = 0
         for o in range(self.octaves):
             o2 = 1 << o
@@ -0,0 +1,63 @@
+"""Pool of reusable NonoGrids, for processes that make or decode lots of puzzles."""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from nonogen.nono import NonoGrid, decode, decode_bytes
+
+
+class GridPool:
+    """Thread-safe pool of idle grids by size.
+
+    get() hands out an idle grid of the right size if there is one, or a new one, and put() resets
+    a grid and keeps it for the next get(). At most max_idle grids of each size are kept, so a
+    burst of odd sizes doesn't hold on to memory forever.
+    """
+    def __init__(self, max_idle=16):
+        self.max_idle = max_idle
+        self.idle = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def get(self, height, width=None):
+        """Check out a cleared grid of height by width, which defaults to height."""
+        if width is None:
+            width = height
+
+        with self.lock:
+            idle = self.idle.get((height, width))
+            if idle:
+                return idle.pop()
+
+        return NonoGrid(height, width)
+
+    def put(self, grid):
+        """Return a grid to the pool. It mustn't be used again until it's checked out again."""
+        grid.reset()
+        with self.lock:
+            idle = self.idle[(grid.height, grid.width)]
+            if len(idle) < self.max_idle:
+                idle.append(grid)
+
+    @contextmanager
+    def grid(self, height, width=None):
+        """Check out a grid for the length of a with block."""
+        grid = self.get(height, width)
+        try:
+            yield grid
+        finally:
+            self.put(grid)
+
+    def decode(self, nonostring):
+        """Like nono.decode, but into a grid checked out of the pool. put() it back when done."""
+        return decode(nonostring, pool=self)
+
+    def decode_bytes(self, data):
+        """Like nono.decode_bytes, but into a grid checked out of the pool."""
+        return decode_bytes(data, pool=self)
+
+    def __len__(self):
+        with self.lock:
+            return sum(len(idle) for idle in self.idle.values())
+
+
+GRIDS = GridPool()
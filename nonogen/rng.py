@@ -0,0 +1,58 @@
+"""Random number sources for generators.
+
+Generators take an rng argument that can be None (use the random module), a seed, a
+random.Random, or a NumPy Generator, and turn it into something with the random.Random methods
+they need through as_random().
+"""
+import random
+
+import numpy as np
+
+
+class NumpyRandom:
+    """The parts of the random.Random interface generators use, on top of a NumPy Generator."""
+    def __init__(self, generator):
+        self.generator = generator
+
+    def getrandbits(self, k):
+        if k == 0:
+            return 0
+
+        nbytes = (k + 7) // 8
+        return int.from_bytes(self.generator.bytes(nbytes), "big") >> (nbytes * 8 - k)
+
+    def gauss(self, mu=0.0, sigma=1.0):
+        return float(self.generator.normal(mu, sigma))
+
+    def uniform(self, a, b):
+        return float(self.generator.uniform(a, b))
+
+
+def is_seed(rng):
+    """Check if an rng argument is a seed rather than a source of random numbers."""
+    return isinstance(rng, (int, float, str, bytes, bytearray))
+
+
+def as_random(rng=None):
+    """Turn an rng argument into something with random.Random's methods."""
+    if rng is None:
+        return random
+
+    if is_seed(rng):
+        return random.Random(rng)
+
+    if isinstance(rng, np.random.Generator):
+        return NumpyRandom(rng)
+
+    return rng
+
+
+def as_generator(rng=None):
+    """Turn an rng argument into a NumPy Generator, for drawing many numbers at once."""
+    if isinstance(rng, np.random.Generator):
+        return rng
+
+    if isinstance(rng, NumpyRandom):
+        return rng.generator
+
+    return np.random.default_rng(as_random(rng).getrandbits(64))
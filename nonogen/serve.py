@@ -0,0 +1,151 @@
+"""Local HTTP service handing out puzzles from a pool kept warm in the background.
+
+Worker processes generate unique puzzles, with hints and rendered pictures, into a pool. Requests
+take the next puzzle from the pool, so they don't pay for generating or rendering it.
+
+Endpoints:
+    GET /puzzle  - JSON with the encoded puzzle, hints, seed, and base64 PNG pictures.
+    GET /health  - JSON with the pool size.
+"""
+import asyncio
+import base64
+import json
+import logging
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from nonogen import nonogen
+from nonogen.pool import GRIDS
+
+DEFAULT_HOST = "127.0.0.1"
+
+LOG = logging.getLogger(__name__)
+
+_REASONS = {200: "OK", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+def make_puzzle(height, width, gen_name, seed):
+    """Generate a unique puzzle and render it, in a worker process. Returns None on failure."""
+    gen = nonogen.GENERATORS[gen_name]
+    with GRIDS.grid(height, width) as grid:
+        if nonogen.gen_unique(grid, gen=gen, rng=random.Random(seed)) is None:
+            return None
+
+        unsolved_png, solved_png = grid.to_pictures(format="PNG")
+
+        return {"puzzle": grid.encode(), "type": grid.type, "seed": grid.seed,
+                "gen_kwargs": grid.gen_kwargs,
+                "height": height, "width": width,
+                "left_hints": grid.left_hints, "top_hints": grid.top_hints,
+                "png": base64.b64encode(unsolved_png).decode(),
+                "solved_png": base64.b64encode(solved_png).decode()}
+
+
+class PuzzleServer:
+    """Asyncio HTTP server backed by a pool of ready puzzles."""
+    def __init__(self, height=15, width=None, gen_name="Perlin", pool_size=16, workers=None,
+                 seed=None):
+        self.height = height
+        self.width = width or height
+        # Checked here, since a bad name would otherwise only fail in the workers.
+        self.gen_name = nonogen.generator_name(gen_name)
+        self.pool_size = pool_size
+        self.workers = workers or os.cpu_count() or 1
+
+        # Puzzle seeds count up from here, so a server seed gives the same puzzles in order.
+        self.next_seed = random.getrandbits(64) if seed is None else seed
+
+        self.pool = None
+        self.executor = None
+        self.server = None
+        self._refillers = []
+
+    async def start(self, host=DEFAULT_HOST, port=0):
+        """Start filling the pool and listening. Returns the port listened on."""
+        # Made here rather than in __init__, so it belongs to the running loop.
+        self.pool = asyncio.Queue(maxsize=self.pool_size)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._refillers = [asyncio.ensure_future(self._refill()) for _ in range(self.workers)]
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for refiller in self._refillers:
+            refiller.cancel()
+        await asyncio.gather(*self._refillers, return_exceptions=True)
+
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    async def _refill(self):
+        """Keep generating puzzles into the pool, waiting while it's full.
+
+        A puzzle that fails with an error is logged and skipped, so one bad seed doesn't stop the
+        pool filling and leave requests waiting forever.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            seed = self.next_seed
+            self.next_seed += 1
+
+            try:
+                puzzle = await loop.run_in_executor(self.executor, make_puzzle, self.height,
+                                                    self.width, self.gen_name, seed)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                LOG.exception("Generating puzzle with seed %d failed", seed)
+                continue
+
+            if puzzle is not None:
+                await self.pool.put(puzzle)
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+
+            # Skip headers, nothing here needs them.
+            while (await reader.readline()).strip():
+                pass
+
+            parts = request_line.decode("latin-1").split()
+            if len(parts) < 2:
+                return
+
+            method, target = parts[0], parts[1]
+            if method != "GET":
+                status, body = 405, {"error": "only GET is supported"}
+            elif target == "/puzzle":
+                status, body = 200, await self.pool.get()
+            elif target == "/health":
+                status, body = 200, {"pool": self.pool.qsize(), "pool_max": self.pool.maxsize}
+            else:
+                status, body = 404, {"error": f"no such endpoint {target}"}
+
+            payload = json.dumps(body).encode()
+            writer.write(f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                         "Content-Type: application/json\r\n"
+                         f"Content-Length: {len(payload)}\r\n"
+                         "Connection: close\r\n\r\n".encode("latin-1") + payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(host=DEFAULT_HOST, port=8000, **kwargs):
+    """Run a PuzzleServer until cancelled."""
+    server = PuzzleServer(**kwargs)
+    port = await server.start(host, port)
+    print(f"Serving puzzles on http://{host}:{port}/puzzle")
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await server.stop()
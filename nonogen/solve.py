@@ -0,0 +1,445 @@
+"""Nonogram line solver and uniqueness checker.
+
+Lines are handled as pairs of bitmasks, one of the cells known to be filled and one of the cells
+known to be empty, with the first cell of the line as the most significant bit (the same layout
+NonoGrid uses for its rows).
+"""
+from functools import lru_cache
+
+# Line logic alone fills in the whole grid.
+SOLVED = "solved"
+
+# Exactly one solution, but line logic alone can't find it.
+UNIQUE = "unique"
+
+# More than one solution.
+AMBIGUOUS = "ambiguous"
+
+# No solution at all.
+CONTRADICTORY = "contradictory"
+
+# Gave up once the difficulty score went over the limit asked for.
+TOO_HARD = "too hard"
+
+# Difficulty score added for all of a grid's cells needing lookahead past line logic, and for
+# each guess while backtracking. Each line logic pass adds the fraction of cells still unknown.
+LOOKAHEAD_COST = 5.0
+GUESS_COST = 2.0
+
+# Difficulty bands by name, with the score each goes up to.
+BANDS = (("easy", 1.5), ("medium", 2.5), ("hard", 4.0), ("expert", float("inf")))
+
+
+class Difficulty:
+    """How much work solving a puzzle took, scored.
+
+    The score is the sum, over line logic passes, of the fraction of cells still unknown before
+    each pass, so a puzzle line logic solves in one sweep scores about 1, and one that needs many
+    passes that each learn little scores higher. Cells line logic can't reach add LOOKAHEAD_COST
+    times the fraction of cells they make up, and each guess adds GUESS_COST.
+    """
+    def __init__(self, cells):
+        self.cells = cells
+
+        # Cells learned in each line logic pass over the rows and then the columns.
+        self.passes = []
+
+        # Cells left unknown after line logic, needing lookahead to solve.
+        self.lookahead_cells = 0
+
+        # How many cells had to be guessed during backtracking.
+        self.guesses = 0
+
+        self.score = 0.0
+
+    def __repr__(self):
+        return (f"Difficulty({self.score:.2f}, passes={len(self.passes)}, "
+                f"lookahead_cells={self.lookahead_cells}, guesses={self.guesses})")
+
+    @property
+    def band(self):
+        """Name of the band in BANDS the score falls in."""
+        for name, limit in BANDS:
+            if self.score <= limit:
+                return name
+
+        return BANDS[-1][0]
+
+    @property
+    def needs_guessing(self):
+        """True if line logic alone can't solve the puzzle."""
+        return self.lookahead_cells > 0
+
+
+class SolveResult:
+    """Outcome of solving a puzzle from its hints."""
+    def __init__(self, status, solutions, guesses, difficulty=None):
+        self.status = status
+
+        # Each solution is a list of row bitmasks, like NonoGrid.value_rows.
+        self.solutions = solutions
+
+        # How many cells had to be guessed during backtracking.
+        self.guesses = guesses
+
+        # Difficulty, as far as solving got.
+        self.difficulty = difficulty
+
+    def __repr__(self):
+        return f"SolveResult({self.status!r}, guesses={self.guesses})"
+
+    @property
+    def unique(self):
+        """True if the puzzle has exactly one solution."""
+        return self.status in (SOLVED, UNIQUE)
+
+    @property
+    def solution(self):
+        """The first solution found, or None."""
+        return self.solutions[0] if self.solutions else None
+
+
+def _runs_of(mask, size):
+    """Mask of bits that start a run of at least size set bits, going up."""
+    span = 1
+    while span * 2 <= size:
+        mask &= mask >> span
+        span *= 2
+    return mask & (mask >> (size - span))
+
+
+def _smear(mask, size):
+    """Extend every set bit up through the size bits starting at it."""
+    span = 1
+    while span * 2 <= size:
+        mask |= mask << span
+        span *= 2
+    return mask | (mask << (size - span))
+
+
+def _fill_up(seeds, steps):
+    """Everything reachable from seeds by moving up through the bits set in steps."""
+    # Adding in the first step up from each seed carries on up through the rest of its run of
+    # steps, and the carries are exactly the bits reached.
+    firsts = steps & (seeds << 1)
+    return seeds | firsts | (steps & ((steps + firsts) ^ steps ^ firsts))
+
+
+def _fill_down(seeds, steps):
+    """Everything reachable from seeds by moving down through the bits set in steps."""
+    # Carries only go up, so going down doubles how far it reaches each time instead, until no
+    # run of steps is that long.
+    shift = 1
+    while steps:
+        seeds |= steps & (seeds >> shift)
+        steps &= steps >> shift
+        shift <<= 1
+    return seeds
+
+
+@lru_cache(maxsize=1 << 16)
+def solve_line(clue, length, filled, empty):
+    """Find every cell the clue forces in a line, given what's already known about it.
+
+    clue is a tuple of block lengths, with no zeroes; an empty line has the empty tuple.
+    Returns (filled, empty) masks of all cells known after solving, or None if the clue can't fit.
+    """
+    # Work with cell i as bit i, and with "positions" 0 to length between cells, position i
+    # being just before cell i. Everything is done a whole line at a time with bit operations.
+    # The first cell is the most significant bit, so the line is read from its end, and the
+    # clue has to be too.
+    clue = clue[::-1]
+    k = len(clue)
+    full = (1 << length) - 1
+    positions = (full << 1) | 1
+    can_empty = full & ~filled
+    can_fill = full & ~empty
+
+    # Going up from position i to i+1 passes over cell i, which must then be empty.
+    steps_up = can_empty << 1
+    starts = {size: _runs_of(can_fill, size) for size in set(clue)}
+
+    # fwd[j]: positions i such that the first j blocks fit in the cells before i.
+    fwd = [_fill_up(1, steps_up)]
+    for j, size in enumerate(clue):
+        before = fwd[j] if j == 0 else (fwd[j] & can_empty) << 1
+        ends = (before & starts[size]) << size
+        fwd.append(_fill_up(ends, steps_up) & positions)
+
+    if not fwd[k] >> length & 1:
+        return None
+
+    # bwd[j]: positions i such that blocks j onwards fit in the cells from i on.
+    bwd = [0] * k + [_fill_down(1 << length, can_empty)]
+    for j in range(k - 1, -1, -1):
+        size = clue[j]
+        after = bwd[k] if j == k - 1 else (bwd[j+1] >> 1) & can_empty
+        bwd[j] = _fill_down(starts[size] & (after >> size), can_empty)
+
+    # Cells that can be empty in some placement: between blocks j-1 and j.
+    maybe_empty = 0
+    for j in range(k + 1):
+        maybe_empty |= fwd[j] & (bwd[j] >> 1)
+    maybe_empty &= can_empty
+
+    # Cells that can be filled in some placement: covered by some block.
+    maybe_filled = 0
+    for j, size in enumerate(clue):
+        before = fwd[0] if j == 0 else (fwd[j] & can_empty) << 1
+        after = bwd[k] if j == k - 1 else (bwd[j+1] >> 1) & can_empty
+        maybe_filled |= _smear(before & starts[size] & (after >> size), size)
+
+    return full & ~maybe_empty, full & ~maybe_filled
+
+
+def _clues(hints):
+    """Convert hint lists to tuples of block lengths, as solve_line wants them."""
+    return [tuple(h for h in hint if h) for hint in hints]
+
+
+def _sweep(clues, length, line_filled, line_empty, cross_filled, cross_empty, cross_length,
+           lines, dirty_cross):
+    """Solve the given lines, pushing anything learned into the crossing lines.
+
+    Crossing lines that learn something are added to dirty_cross.
+    Returns how many cells were learned, or None on a contradiction.
+    """
+    learned = 0
+    for line in lines:
+        solved = solve_line(clues[line], length, line_filled[line], line_empty[line])
+        if solved is None:
+            return None
+
+        filled, empty = solved
+        new_filled = filled & ~line_filled[line]
+        new_empty = empty & ~line_empty[line]
+        if not new_filled and not new_empty:
+            continue
+
+        line_filled[line] = filled
+        line_empty[line] = empty
+        learned += bin(new_filled | new_empty).count("1")
+
+        cross_bit = 1 << (cross_length - 1 - line)
+        for new, cross in ((new_filled, cross_filled), (new_empty, cross_empty)):
+            while new:
+                low = new & -new
+                new ^= low
+                c = length - low.bit_length()
+                cross[c] |= cross_bit
+                dirty_cross.add(c)
+
+    return learned
+
+
+def _propagate(row_clues, col_clues, state, dirty_rows, dirty_cols, difficulty=None,
+               max_score=None):
+    """Run line logic over dirty rows and columns until nothing changes.
+
+    If difficulty is given, each pass is recorded in it, and propagation stops early once its
+    score goes over max_score. Returns how many cells were learned, or None on a contradiction
+    or stopping early.
+    """
+    row_filled, row_empty, col_filled, col_empty = state
+    height = len(row_clues)
+    width = len(col_clues)
+    unknown = height * width
+    learned = 0
+
+    while dirty_rows or dirty_cols:
+        if difficulty is not None:
+            difficulty.score += unknown / difficulty.cells
+            if max_score is not None and difficulty.score > max_score:
+                return None
+
+        rows = sorted(dirty_rows)
+        dirty_rows.clear()
+        row_learned = _sweep(row_clues, width, row_filled, row_empty, col_filled, col_empty,
+                             height, rows, dirty_cols)
+        if row_learned is None:
+            return None
+
+        cols = sorted(dirty_cols)
+        dirty_cols.clear()
+        col_learned = _sweep(col_clues, height, col_filled, col_empty, row_filled, row_empty,
+                             width, cols, dirty_rows)
+        if col_learned is None:
+            return None
+
+        learned += row_learned + col_learned
+        if difficulty is not None:
+            difficulty.passes.append(row_learned + col_learned)
+            unknown -= row_learned + col_learned
+
+    return learned
+
+
+def _assume(state, r, c, value):
+    """Copy of state with the cell at row r, column c set to value."""
+    row_filled, row_empty, col_filled, col_empty = (list(masks) for masks in state)
+    row_bit = 1 << (len(col_filled) - 1 - c)
+    col_bit = 1 << (len(row_filled) - 1 - r)
+    if value:
+        row_filled[r] |= row_bit
+        col_filled[c] |= col_bit
+    else:
+        row_empty[r] |= row_bit
+        col_empty[c] |= col_bit
+
+    return row_filled, row_empty, col_filled, col_empty
+
+
+def _unknown_cells(state):
+    """All (row, column) pairs not yet known to be filled or empty."""
+    row_filled, row_empty, col_filled, _ = state
+    width = len(col_filled)
+    full_row = (1 << width) - 1
+    for r, (filled, empty) in enumerate(zip(row_filled, row_empty)):
+        unknown = full_row & ~(filled | empty)
+        while unknown:
+            low = unknown & -unknown
+            unknown ^= low
+            yield r, width - low.bit_length()
+
+
+def _probe(row_clues, col_clues, state):
+    """Try both values of every unknown cell, fixing any cell whose other value contradicts.
+
+    state is updated in place. Returns (False, None) on a contradiction, otherwise True and the
+    propagated (filled, empty) states of the cell that's best to guess at, which is None once
+    nothing is left unknown.
+    """
+    known = _known_count(state)
+    while True:
+        progress = False
+        best = None
+        best_score = -1
+        for r, c in _unknown_cells(state):
+            # An earlier probe this round may have filled this cell in already.
+            row_bit = 1 << (len(col_clues) - 1 - c)
+            if (state[0][r] | state[1][r]) & row_bit:
+                continue
+
+            branches = []
+            learned = []
+            for value in (True, False):
+                branch = _assume(state, r, c, value)
+                branch_learned = _propagate(row_clues, col_clues, branch, {r}, {c})
+                if branch_learned is None:
+                    branch = None
+                branches.append(branch)
+                learned.append(branch_learned)
+
+            filled, empty = branches
+            if filled is None and empty is None:
+                return False, None
+
+            if filled is None or empty is None:
+                forced = filled or empty
+                for masks, new in zip(state, forced):
+                    masks[:] = new
+                known += 1 + (learned[0] if filled else learned[1])
+                progress = True
+                continue
+
+            # Prefer cells where even the weaker guess tells us a lot, counting what's known
+            # with it.
+            score = known + 1 + min(learned)
+            if score > best_score:
+                best = branches
+                best_score = score
+
+        if not progress:
+            return True, best
+
+
+def _known_count(state):
+    """How many cells are known in a state."""
+    return sum(bin(filled | empty).count("1") for filled, empty in zip(state[0], state[1]))
+
+
+def _search(row_clues, col_clues, state, solutions, max_solutions, difficulty, max_score=None):
+    """Backtrack from a propagated state, collecting up to max_solutions solutions.
+
+    Line logic is extended by probing at each step, and guessing only happens when probing
+    can't force any cell. Each guess is added to difficulty as it's made, and the search stops
+    as soon as the score goes over max_score.
+    """
+    ok, branches = _probe(row_clues, col_clues, state)
+    if not ok:
+        return
+
+    if branches is None:
+        solutions.append(list(state[0]))
+        return
+
+    for branch in branches:
+        if len(solutions) >= max_solutions:
+            break
+
+        difficulty.guesses += 1
+        difficulty.score += GUESS_COST
+        if max_score is not None and difficulty.score > max_score:
+            return
+
+        _search(row_clues, col_clues, branch, solutions, max_solutions, difficulty, max_score)
+        if max_score is not None and difficulty.score > max_score:
+            return
+
+
+def solve(left_hints, top_hints, max_solutions=2, max_score=None):
+    """Solve a puzzle from its row and column hints, scoring its difficulty along the way.
+
+    Stops looking once max_solutions solutions have been found; the default is enough to tell
+    unique puzzles from ambiguous ones. If max_score is given, gives up with status TOO_HARD as
+    soon as the difficulty score goes over it, which skips the expensive part of solving hard
+    puzzles.
+    """
+    row_clues = _clues(left_hints)
+    col_clues = _clues(top_hints)
+    height = len(row_clues)
+    width = len(col_clues)
+
+    difficulty = Difficulty(height * width or 1)
+    state = ([0] * height, [0] * height, [0] * width, [0] * width)
+    if _propagate(row_clues, col_clues, state, set(range(height)), set(range(width)),
+                  difficulty, max_score) is None:
+        if max_score is not None and difficulty.score > max_score:
+            return SolveResult(TOO_HARD, [], 0, difficulty)
+
+        return SolveResult(CONTRADICTORY, [], 0, difficulty)
+
+    difficulty.lookahead_cells = difficulty.cells - _known_count(state) if height * width else 0
+    if not difficulty.lookahead_cells:
+        return SolveResult(SOLVED, [list(state[0])], 0, difficulty)
+
+    difficulty.score += LOOKAHEAD_COST * difficulty.lookahead_cells / difficulty.cells
+    if max_score is not None and difficulty.score > max_score:
+        return SolveResult(TOO_HARD, [], 0, difficulty)
+
+    solutions = []
+    _search(row_clues, col_clues, state, solutions, max_solutions, difficulty, max_score)
+    if max_score is not None and difficulty.score > max_score:
+        status = TOO_HARD
+    elif not solutions:
+        status = CONTRADICTORY
+    elif len(solutions) == 1:
+        status = UNIQUE
+    else:
+        status = AMBIGUOUS
+
+    return SolveResult(status, solutions, difficulty.guesses, difficulty)
+
+
+def solve_grid(grid, max_solutions=2, max_score=None):
+    """Solve a NonoGrid from its hints. Call gen_hints on it first."""
+    return solve(grid.left_hints, grid.top_hints, max_solutions=max_solutions,
+                 max_score=max_score)
+
+
+def rate_grid(grid, max_score=None):
+    """Score how hard a NonoGrid is to solve from its hints, returning a Difficulty.
+
+    Call gen_hints on it first. With max_score, rating stops as soon as the score goes over it.
+    """
+    return solve_grid(grid, max_score=max_score).difficulty
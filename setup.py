@@ -16,14 +16,14 @@ setup(author="Andrew Michaud",
                    "Natural Language :: English",
                    "Operating System :: MacOS :: MacOS X",
                    "Operating System :: POSIX :: Linux",
-                   "Programming Language :: Python :: 3.6",
+                   "Programming Language :: Python :: 3.8",
                    "Programming Language :: Python :: Implementation :: CPython",
                    "Topic :: Software Development :: Libraries"
                    ],
 
-      entry_points={},
+      entry_points={"console_scripts": ["nonogen=nonogen.__main__:main"]},
 
-      install_requires=["Pillow"],
+      install_requires=["numpy", "Pillow>=9.2"],
 
       license="BSD3",
 
@@ -31,7 +31,7 @@ setup(author="Andrew Michaud",
 
       packages=find_packages(),
 
-      python_requires=">=3.6",
+      python_requires=">=3.8",
 
       url="https://github.com/alixnovosi/nonogen",
 
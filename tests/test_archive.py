@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from nonogen.archive import HEADER, Archive, ArchiveWriter, write_archive
+from nonogen.nono import NonoGrid
+
+
+def random_grids(count):
+    rng = random.Random(0)
+    grids = []
+    for _ in range(count):
+        height, width = rng.randint(1, 30), rng.randint(1, 30)
+        grid = NonoGrid(height, width)
+        grid.value_rows = [rng.getrandbits(width) for _ in range(height)]
+        grids.append(grid)
+    return grids
+
+
+def test_round_trip(tmp_path):
+    grids = random_grids(50)
+    filename = tmp_path / "puzzles.nonoarc"
+    assert write_archive(filename, grids) == len(grids)
+
+    with Archive(filename) as archive:
+        assert len(archive) == len(grids)
+        for grid, read in zip(grids, archive):
+            assert (read.height, read.width) == (grid.height, grid.width)
+            assert read.value_rows == grid.value_rows
+
+        assert bytes(archive.get_bytes(7)) == grids[7].encode_bytes()
+
+
+def test_negative_index(tmp_path):
+    grids = random_grids(5)
+    filename = tmp_path / "puzzles.nonoarc"
+    write_archive(filename, grids)
+
+    with Archive(filename) as archive:
+        assert archive[-1].value_rows == grids[-1].value_rows
+        assert archive[-5].value_rows == grids[0].value_rows
+        for k in (5, -6):
+            with pytest.raises(IndexError):
+                archive[k]
+
+
+def test_empty_archive(tmp_path):
+    filename = tmp_path / "empty.nonoarc"
+    with ArchiveWriter(filename) as writer:
+        assert len(writer) == 0
+
+    with Archive(filename) as archive:
+        assert len(archive) == 0
+        assert list(archive) == []
+        with pytest.raises(IndexError):
+            archive[0]
+
+
+@pytest.mark.parametrize("data", [b"", b"NONOARC", b"NOTANARC" + bytes(HEADER.size)])
+def test_not_an_archive(tmp_path, data):
+    filename = tmp_path / "bad.nonoarc"
+    filename.write_bytes(data)
+    with pytest.raises(ValueError, match="not a puzzle archive"):
+        Archive(filename)
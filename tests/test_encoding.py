@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from nonogen.nono import (HEADER, NonoGrid, decode, decode_bytes, pack_rows, unpack_rows)
+from nonogen.pool import GridPool
+
+# A 3x4 grid with rows 1010, 0111 and 1000, as encoded before the binary form existed.
+LEGACY = "eJyrVs9IzUzPKFG3UjDWUVAvz0wpyQCyTYDs4sLSxKLUYiBPPdHcQr0WAB55DKs="
+
+
+def random_grid(rng, height, width):
+    grid = NonoGrid(height, width)
+    grid.value_rows = [rng.getrandbits(width) if width else 0 for _ in range(height)]
+    return grid
+
+
+def test_pack_rows_round_trip():
+    rng = random.Random(0)
+    for _ in range(500):
+        height, width = rng.randint(0, 20), rng.randint(0, 20)
+        rows = [rng.getrandbits(width) if width else 0 for _ in range(height)]
+
+        data = pack_rows(rows, width)
+        assert len(data) == (height * width + 7) // 8
+        assert unpack_rows(data, height, width) == rows
+
+
+def test_pack_rows_layout():
+    # Row-major, first square in the high bit, padded with zeros at the end.
+    assert pack_rows([0b101, 0b011, 0b100], 3) == bytes([0b10101110, 0b00000000])
+
+
+def test_encode_round_trip():
+    rng = random.Random(1)
+    for height, width in [(1, 1), (5, 5), (7, 13), (25, 25), (30, 9)]:
+        grid = random_grid(rng, height, width)
+
+        assert decode(grid.encode()).value_rows == grid.value_rows
+        assert decode_bytes(grid.encode_bytes()).value_rows == grid.value_rows
+
+
+def test_decode_legacy():
+    grid = decode(LEGACY)
+    assert (grid.height, grid.width) == (3, 4)
+    assert grid.value_rows == [0b1010, 0b0111, 0b1000]
+
+
+def test_decode_into_grid():
+    grid = random_grid(random.Random(2), 10, 10)
+    into = NonoGrid(10, 10)
+    assert decode(grid.encode(), into) is into
+    assert into.value_rows == grid.value_rows
+
+    with pytest.raises(ValueError):
+        decode(grid.encode(), NonoGrid(10, 9))
+
+
+@pytest.mark.parametrize("data", [b"", b"\x01\x00", lambda d: d[:-5], lambda d: d + b"\x00"])
+def test_decode_bytes_rejects_bad_lengths(data):
+    if callable(data):
+        data = data(random_grid(random.Random(3), 10, 10).encode_bytes())
+
+    with pytest.raises(ValueError):
+        decode_bytes(data)
+
+
+def test_decode_bytes_rejects_unknown_version():
+    with pytest.raises(ValueError):
+        decode_bytes(HEADER.pack(99, 1, 1) + b"\x00")
+
+
+def test_decode_into_pool():
+    pool = GridPool()
+    grid = random_grid(random.Random(4), 6, 7)
+    decoded = pool.decode(grid.encode())
+    assert decoded.value_rows == grid.value_rows
+
+    pool.put(decoded)
+    assert pool.decode(grid.encode()) is decoded
+    assert pool.decode(LEGACY).value_rows == [0b1010, 0b0111, 0b1000]
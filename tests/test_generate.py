@@ -0,0 +1,68 @@
+import json
+import random
+
+import pytest
+
+from nonogen import nonogen
+from nonogen.batch import gen_batch
+from nonogen.nono import NonoGrid
+
+
+@pytest.mark.parametrize("gen, kwargs", [
+    (nonogen.gen_perlin, {"arbitrary": 7, "res": 20, "threshold": 0.1}),
+    (nonogen.gen_symmetric, {"symmetry": "both", "base": "Random"}),
+    (nonogen.gen_cellular, {"fill": 0.6, "steps": 1}),
+])
+def test_regenerate_with_kwargs(gen, kwargs):
+    grid = NonoGrid(12, 10)
+    assert nonogen.gen_unique(grid, gen=gen, rng=random.Random(3), **kwargs) is not None
+    assert grid.gen_kwargs == kwargs
+
+    again = NonoGrid(12, 10)
+    again.type, again.seed, again.gen_kwargs = grid.type, grid.seed, grid.gen_kwargs
+    nonogen.regenerate(again)
+    assert again.value_rows == grid.value_rows
+
+
+def test_gen_image_leaves_random_alone():
+    Image = pytest.importorskip("PIL.Image")
+    image = Image.new("L", (8, 8), 0)
+
+    random.seed(5)
+    expected = random.random()
+    random.seed(5)
+    grid = NonoGrid(4, 4)
+    nonogen.gen_image(grid, image=image)
+    assert random.random() == expected
+    assert grid.seed is None
+
+
+def test_batch_records_kwargs():
+    kwargs = {"symmetry": "horizontal", "base": "Cellular"}
+    puzzles = list(gen_batch(2, 10, 10, gen_name="symmetric", workers=1, gen_kwargs=kwargs))
+    for puzzle in puzzles:
+        puzzle = json.loads(json.dumps(puzzle))
+        grid = NonoGrid(10, 10)
+        grid.type, grid.seed, grid.gen_kwargs = (puzzle["type"], puzzle["puzzle_seed"],
+                                                 puzzle["gen_kwargs"])
+        nonogen.regenerate(grid)
+        assert grid.encode() == puzzle["puzzle"]
+
+
+def test_gen_unique_seed_varies_attempts():
+    stats = nonogen.GenStats()
+    grid = NonoGrid(10, 10)
+    # Random 10x10 grids are rarely unique, so one seed reused would fail every attempt.
+    assert nonogen.gen_unique(grid, gen=nonogen.gen_random, rng=7, stats=stats) is not None
+
+    again = NonoGrid(10, 10)
+    nonogen.gen_unique(again, gen=nonogen.gen_random, rng=7)
+    assert again.value_rows == grid.value_rows
+
+
+def test_symmetric_base_any_case():
+    grid = NonoGrid(8, 8)
+    nonogen.gen_symmetric(grid, rng=1, base="cellular")
+    expected = NonoGrid(8, 8)
+    nonogen.gen_symmetric(expected, rng=1, base="Cellular")
+    assert grid.value_rows == expected.value_rows
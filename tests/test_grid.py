@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from nonogen.nono import NonoGrid
+
+
+def fresh_copy(grid):
+    """A grid with the same squares, hints worked out from scratch."""
+    copy = NonoGrid(grid.height, grid.width)
+    copy.value_rows = list(grid.value_rows)
+    copy.gen_hints()
+    return copy
+
+
+def test_set_cell_matches_gen_hints():
+    rng = random.Random(0)
+    for height, width in [(1, 1), (3, 4), (7, 5), (12, 12)]:
+        grid = NonoGrid(height, width)
+        grid.value_rows = [rng.getrandbits(width) for _ in range(height)]
+        grid.gen_hints()
+        str(grid)
+
+        for _ in range(200):
+            grid.set_cell(rng.randrange(height), rng.randrange(width), rng.random() < 0.5)
+            expected = fresh_copy(grid)
+
+            assert grid.left_hints == expected.left_hints
+            assert grid.top_hints == expected.top_hints
+            assert grid.denied_rows == expected.denied_rows
+            assert grid.display_left_hints == expected.display_left_hints
+            assert grid.display_top_hints == expected.display_top_hints
+            assert grid.max_left_hint_size == expected.max_left_hint_size
+            assert grid.max_top_hint_size == expected.max_top_hint_size
+
+
+def test_set_cell_indices():
+    grid = NonoGrid(3, 4)
+    grid.gen_hints()
+    grid.set_cell(-1, -1, True)
+    assert grid.value_rows == [0, 0, 0b0001]
+    assert grid.left_hints[2] == (1,) and grid.top_hints[3] == (1,)
+
+    for r, c in [(0, 4), (0, -5), (3, 0), (-4, 0)]:
+        with pytest.raises(IndexError):
+            grid.set_cell(r, c, True)
+    assert grid.value_rows == [0, 0, 0b0001]
@@ -0,0 +1,61 @@
+import random
+
+from nonogen.dedup import HintIndex
+from nonogen.nono import NonoGrid, hints_hash, pack_hints, unpack_hints
+
+
+def random_hints(rng, height, width):
+    grid = NonoGrid(height, width)
+    grid.value_rows = [rng.getrandbits(width) for _ in range(height)]
+    grid.gen_hints()
+    return grid.left_hints, grid.top_hints
+
+
+def test_pack_hints_round_trip():
+    rng = random.Random(0)
+    for height, width in [(1, 1), (5, 5), (3, 17), (40, 25)]:
+        left, top = random_hints(rng, height, width)
+        assert unpack_hints(pack_hints(left, top)) == (left, top)
+
+    # Runs and sizes of 128 and over take more than one byte.
+    left, top = [(300,), (0,), (1, 200)], [(1,)] * 300
+    assert unpack_hints(pack_hints(left, top)) == (left, top)
+
+
+def test_empty_line_forms_hash_the_same():
+    forms = [
+        ([(0,), (2,)], [(1,), (1,)]),
+        ([(), (2,)], [(1,), (1,)]),
+        ([[0], [2]], [[1], [1]]),
+        ([[], (2,)], [[1], (1,)]),
+    ]
+    packed = {pack_hints(left, top) for left, top in forms}
+    assert len(packed) == 1
+    assert len({hints_hash(left, top) for left, top in forms}) == 1
+
+    assert hints_hash([(0,), (2,)], [(1,), (1,)]) != hints_hash([(2,), (0,)], [(1,), (1,)])
+
+
+def test_hint_index(tmp_path):
+    filename = tmp_path / "seen.db"
+    rng = random.Random(1)
+    hashes = [hints_hash(*random_hints(rng, 6, 6)) for _ in range(20)]
+
+    with HintIndex(filename, commit_every=7) as index:
+        assert all(index.add(h) for h in hashes)
+        assert not index.add(hashes[3])
+        assert len(index) == len(hashes)
+        assert hashes[0] in index
+        assert bytes(16) not in index
+
+    with HintIndex(filename) as index:
+        assert len(index) == len(hashes)
+        assert all(h in index for h in hashes)
+        assert not index.add(hashes[-1])
+
+        grid = NonoGrid(4, 4)
+        grid.value_rows = [0b1001, 0b0110, 0, 0b1111]
+        grid.gen_hints()
+        assert index.add_grid(grid)
+        assert hints_hash(grid.left_hints, grid.top_hints) in index
+        assert not index.add_grid(grid)
@@ -0,0 +1,19 @@
+import types
+
+import nonogen
+
+
+def test_star_import_exports_only_the_api():
+    namespace = {}
+    exec("from nonogen import *", namespace)
+    exported = set(namespace) - {"__builtins__"}
+
+    assert {"NonoGrid", "decode", "gen_perlin", "GENERATORS"} <= exported
+    assert not [name for name in exported if isinstance(namespace[name], types.ModuleType)]
+    assert "lru_cache" not in exported and "datetime" not in exported
+
+
+def test_lazy_names_are_kept():
+    assert nonogen.gen_random is nonogen.nonogen.gen_random
+    assert vars(nonogen)["gen_random"] is nonogen.gen_random
+    assert nonogen.solve is vars(nonogen)["solve"]
@@ -0,0 +1,73 @@
+import time
+
+import numpy as np
+import pytest
+
+from nonogen.perlin import MAX_EAGER_GRADIENTS, PerlinNoiseFactory
+
+
+def test_field_matches_scalar():
+    xs = np.arange(-10, 20) / 7
+    ys = np.arange(-6, 12) / 5
+    for dimension, tile, eager in [(1, (3,), False), (2, (4, 0), False), (2, (3, 5), False),
+                                   (1, (3,), True), (2, (3, 5), True)]:
+        axes = (xs, ys)[:dimension]
+        pnf = PerlinNoiseFactory(dimension, octaves=3, tile=tile, eager=eager, rng=1)
+        field = pnf.field(*axes)
+
+        # The scalar path reuses the gradients the field made, or the eager lattice, so it has
+        # to agree exactly.
+        for index in np.ndindex(field.shape):
+            point = [axis[i] for axis, i in zip(axes, index)]
+            assert np.isclose(pnf(*point), field[index])
+
+
+def test_eager_lattice_cap():
+    # With 4 octaves, the lattice is (8 * tile + 1) along each side, so 1441 ** 2 gradients
+    # for a tile of 180 and 1449 ** 2 for 181, either side of the cap.
+    assert 1441 ** 2 <= MAX_EAGER_GRADIENTS < 1449 ** 2
+
+    pnf = PerlinNoiseFactory(2, octaves=4, tile=(180, 180), eager=True, rng=0)
+    assert pnf.gradient_lattice.shape == (1441, 1441, 2)
+
+    with pytest.raises(ValueError):
+        PerlinNoiseFactory(2, octaves=4, tile=(181, 181), eager=True)
+
+
+def test_same_seed_same_noise():
+    xs = np.arange(40) / 9
+    first = PerlinNoiseFactory(2, octaves=4, tile=(5, 5), rng=7).field(xs, xs)
+    second = PerlinNoiseFactory(2, octaves=4, tile=(5, 5), rng=7).field(xs, xs)
+    assert np.array_equal(first, second)
+
+
+def test_hashed_field_matches_scalar():
+    xs = np.arange(-10, 20) / 7
+    pnf = PerlinNoiseFactory(2, octaves=3, tile=(4, 3), hashed=True, rng=2)
+    field = pnf.field(xs, xs)
+    for i, j in np.ndindex(field.shape):
+        assert np.isclose(pnf(xs[i], xs[j]), field[i, j])
+
+    assert -1 <= field.min() and field.max() <= 1
+    assert field.std() > 0.05
+
+
+def test_scalar_sampling_stays_fast():
+    pnf = PerlinNoiseFactory(2, rng=3)
+
+    def sample_time(x0):
+        # Every point is in a new grid cell, so each one makes new gradients.
+        start = time.perf_counter()
+        for i in range(500):
+            pnf(x0 + i + 0.5, 0.5)
+        return time.perf_counter() - start
+
+    first = min(sample_time(x0) for x0 in (0, 1000, 2000))
+
+    # A lot more gradients, both from field() and from sampling.
+    pnf.field(np.arange(300) + 5000.5, np.arange(300) + 0.5)
+    for x0 in range(3000, 20000, 1000):
+        sample_time(x0)
+
+    later = min(sample_time(x0) for x0 in (30000, 31000, 32000))
+    assert later < first * 3
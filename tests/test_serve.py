@@ -0,0 +1,38 @@
+import asyncio
+import json
+
+from nonogen.nono import decode
+from nonogen.serve import PuzzleServer
+
+
+async def get(port, target):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    response = await reader.read()
+    writer.close()
+
+    head, _, body = response.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+    return status, json.loads(body)
+
+
+def test_serve_localhost():
+    async def run():
+        server = PuzzleServer(height=8, pool_size=2, workers=1, seed=0)
+        port = await server.start("127.0.0.1", 0)
+        try:
+            status, puzzle = await asyncio.wait_for(get(port, "/puzzle"), 60)
+            assert status == 200
+            grid = decode(puzzle["puzzle"])
+            assert (grid.height, grid.width) == (8, 8)
+            assert puzzle["type"] == "Perlin" and puzzle["png"] and puzzle["solved_png"]
+
+            status, health = await asyncio.wait_for(get(port, "/health"), 10)
+            assert status == 200 and health["pool_max"] == 2
+
+            status, error = await asyncio.wait_for(get(port, "/nothing"), 10)
+            assert status == 404 and "error" in error
+        finally:
+            await server.stop()
+
+    asyncio.run(run())
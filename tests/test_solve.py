@@ -0,0 +1,88 @@
+import itertools
+import random
+
+from nonogen import solve
+from nonogen.nono import NonoGrid
+
+
+def line_clue(line, length):
+    """Block lengths of a line mask, first cell most significant."""
+    bits = format(line, f"0{length}b") if length else ""
+    return tuple(len(run) for run in bits.split("0") if run)
+
+
+def brute_force_line(clue, length, filled, empty):
+    """What solve_line should give, from every line that fits."""
+    fits = [line for line in range(1 << length)
+            if line_clue(line, length) == clue and line & filled == filled and not line & empty]
+    if not fits:
+        return None
+
+    full = (1 << length) - 1
+    always = full
+    never = full
+    for line in fits:
+        always &= line
+        never &= ~line
+    return always, never
+
+
+def test_solve_line_matches_brute_force():
+    rng = random.Random(0)
+    for length in range(9):
+        full = (1 << length) - 1
+        for _ in range(300):
+            clue = line_clue(rng.getrandbits(length) if length else 0, length)
+            known = rng.getrandbits(length) if length else 0
+            filled = rng.getrandbits(length) & known if length else 0
+            empty = full & known & ~filled
+
+            assert solve.solve_line(clue, length, filled, empty) == brute_force_line(
+                clue, length, filled, empty), (clue, length, filled, empty)
+
+
+def hints_of(rows, height, width):
+    grid = NonoGrid(height, width)
+    grid.value_rows = list(rows)
+    grid.gen_hints()
+    return tuple(grid.left_hints), tuple(grid.top_hints)
+
+
+def test_solve_matches_brute_force():
+    height, width = 3, 4
+    solutions = {}
+    for rows in itertools.product(range(1 << width), repeat=height):
+        solutions.setdefault(hints_of(rows, height, width), []).append(list(rows))
+
+    for (left_hints, top_hints), expected in solutions.items():
+        result = solve.solve(left_hints, top_hints)
+        if len(expected) == 1:
+            assert result.status in (solve.SOLVED, solve.UNIQUE)
+            assert result.solutions == expected
+        else:
+            assert result.status == solve.AMBIGUOUS
+            assert len(result.solutions) == 2
+            assert all(found in expected for found in result.solutions)
+
+
+def test_solve_contradictory():
+    result = solve.solve([(3,), (0,)], [(1,), (1,)])
+    assert result.status == solve.CONTRADICTORY
+    assert not result.solutions
+
+
+def test_max_score_stops_early():
+    rng = random.Random(1)
+    grid = NonoGrid(12, 12)
+    for _ in range(50):
+        grid.value_rows = [rng.getrandbits(12) for _ in range(12)]
+        grid.gen_hints()
+        full = solve.solve_grid(grid)
+        if full.difficulty.guesses > 1:
+            break
+
+    # Room for one guess, so solving has to stop at the second.
+    limit = full.difficulty.score - solve.GUESS_COST * (full.difficulty.guesses - 1.5)
+    capped = solve.solve_grid(grid, max_score=limit)
+    assert capped.status == solve.TOO_HARD
+    assert capped.difficulty.guesses == 2